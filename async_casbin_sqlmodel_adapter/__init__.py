@@ -1,6 +1,35 @@
 """Async SQLModel Adapter for PyCasbin."""
 
-from .adapter import Adapter, AdapterError, Filter
+from .adapter import (
+    Adapter,
+    AdapterError,
+    Filter,
+    Match,
+    PolicyChanges,
+    PolicyPage,
+)
+from .domains import DomainCacheStats, DomainEnforcers
+from .instrumentation import OperationHook, OperationMetrics, opentelemetry_hook
+from .refresh import PolicyRefresher
+from .replicas import ReplicaSet
+from .watcher import Watcher
+from .write_behind import WriteBehindQueue
 
 __version__ = "0.1.5"
-__all__ = ("Adapter", "AdapterError", "Filter")
+__all__ = (
+    "Adapter",
+    "AdapterError",
+    "DomainCacheStats",
+    "DomainEnforcers",
+    "Filter",
+    "Match",
+    "OperationHook",
+    "OperationMetrics",
+    "PolicyChanges",
+    "PolicyPage",
+    "PolicyRefresher",
+    "ReplicaSet",
+    "Watcher",
+    "WriteBehindQueue",
+    "opentelemetry_hook",
+)
@@ -0,0 +1,358 @@
+"""Materialized role inheritance closure of the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from typing_extensions import Self
+
+from .adapter import _chunked, _insert_ignoring_conflicts
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+
+    from sqlalchemy import Select, Table
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    # Yields chunks of the ``(ptype, v0..v5)`` rules of a ptype, in the given domains or all of them if None.
+    RuleReader = Callable[
+        [AsyncSession, str, set[str] | None],
+        AsyncIterator[Sequence[Any]],
+    ]
+
+# Where the role scopes a transaction changed are kept in its session until they are refreshed before it commits,
+# as ``{ptype: {domain: added_links}}``. The added ``(user, role)`` links are None when the domain lost a link,
+# the domains are None when every domain of the ptype may have changed, and the ptype None when every ptype did.
+SCOPES_KEY = "casbin_role_closure_scopes"
+# The domain of the role links of ``g`` rules without one.
+NO_DOMAIN = ""
+# The role definitions' ptypes all start with it.
+ROLE_SECTION = "g"
+# The value position holding the domain of a ``g`` rule.
+DOMAIN_INDEX = 2
+# Number of links added to a domain in one transaction above which its closure is recomputed instead.
+MAX_DELTA_LINKS = 100
+
+ChangedScopes = dict[str | None, dict[str, list[tuple[str, str]] | None] | None]
+
+
+def role_closure(edges: Iterable[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """Return every ``(user, role)`` pair reachable through the role links, with its shortest distance.
+
+    :param edges: The ``(user, role)`` links of a single domain.
+    """
+    graph: dict[str, list[str]] = {}
+    for user, role in edges:
+        graph.setdefault(user, []).append(role)
+    closure: dict[tuple[str, str], int] = {}
+    for user in graph:
+        # The user itself is a role of its own when the links form a cycle, as for casbin's role manager.
+        queue = deque([(user, 1)])
+        while queue:
+            name, depth = queue.popleft()
+            for role in graph.get(name, ()):
+                if (user, role) not in closure:
+                    closure[user, role] = depth
+                    queue.append((role, depth + 1))
+    return closure
+
+
+class RoleClosure:
+    """The table holding, per role ptype and domain, every role a user inherits and at which distance.
+
+    Writes only record the scopes they change. Before the transaction commits, the closure of every domain that
+    only gained links is extended with the pairs each new link joins, and the closure of every other changed
+    domain is recomputed from its role links, writing only the rows that differ.
+
+    Concurrent transactions refresh a ``(ptype, domain)`` scope one at a time: each one locks the scope's row of
+    the lock table, and the row of the ptype's empty domain in shared mode, or exclusively to refresh the whole
+    ptype, until it commits. The rows committed meanwhile are only seen at the ``READ COMMITTED`` isolation
+    level, PostgreSQL's default, which MySQL needs to be set to.
+    """
+
+    def __init__(
+        self: Self,
+        table: Table,
+        lock_table: Table,
+        dialect: str,
+        batch_size: int,
+    ) -> None:
+        """Initialize the closure.
+
+        :param table: The closure table, with ``id``, ``ptype``, ``domain``, ``user``, ``role`` and ``depth``
+            columns.
+        :param lock_table: The table of the rows locked while a scope is refreshed, with ``ptype`` and ``domain``
+            columns.
+        :param dialect: The name of the database dialect.
+        :param batch_size: How many rows are deleted or inserted per statement.
+        """
+        self.table = table
+        self.lock_table = lock_table
+        self._dialect = dialect
+        self._batch_size = batch_size
+
+    @staticmethod
+    def mark(
+        session: AsyncSession,
+        op: str,
+        rows: Iterable[Sequence[str | None]],
+        field_index: int | None = None,
+    ) -> None:
+        """Record the scopes a write changed in its session, with the links it added.
+
+        :param session: The session of the transaction the write was made in.
+        :param op: The kind of write, a ``save`` changes every scope.
+        :param rows: The ``(ptype, v0..v5)`` rows written, or the field values of a ``remove_filtered`` write.
+        :param field_index: The index of the first value of a ``remove_filtered`` write.
+        """
+        scopes: ChangedScopes = session.info.setdefault(SCOPES_KEY, {})
+        if op == "save":
+            scopes[None] = None
+            return
+        for ptype, *values in rows:
+            if not ptype or not ptype.startswith(ROLE_SECTION):
+                continue
+            index = DOMAIN_INDEX - (field_index or 0)
+            domain = values[index] if 0 <= index < len(values) else None
+            if op == "remove_filtered" and not domain:
+                scopes[ptype] = None
+                continue
+            domains = scopes.setdefault(ptype, {})
+            if domains is None:
+                continue
+            links = domains.setdefault(domain or NO_DOMAIN, [])
+            if op != "add":
+                domains[domain or NO_DOMAIN] = None
+            elif links is not None:
+                links.append((values[0] or "", values[1] or ""))
+
+    async def refresh(
+        self: Self,
+        session: AsyncSession,
+        ptypes: Callable[[AsyncSession], Awaitable[list[str]]],
+        rules: RuleReader,
+    ) -> None:
+        """Bring the closure of the scopes the transaction changed up to date.
+
+        :param session: The session of the transaction.
+        :param ptypes: Returns the role ptypes of the rule table.
+        :param rules: Yields the rules of a ptype in some domains.
+        """
+        scopes: ChangedScopes = session.info.pop(SCOPES_KEY, {})
+        if None in scopes:
+            table = self.table
+            stored = await session.scalars(select(table.c.ptype).distinct())
+            scopes = dict.fromkeys([*stored.all(), *await ptypes(session)])
+        # Scopes are locked in the same order by every transaction, so they cannot deadlock.
+        for ptype in sorted(scope for scope in scopes if scope is not None):
+            domains = scopes[ptype]
+            await self._lock(session, ptype, None if domains is None else set(domains))
+            if domains is None:
+                await self._recompute(session, ptype, None, rules)
+                continue
+            recomputed = {
+                domain
+                for domain, links in domains.items()
+                if links is None or len(links) > MAX_DELTA_LINKS
+            }
+            if recomputed:
+                await self._recompute(session, ptype, recomputed, rules)
+            for domain, links in sorted(domains.items()):
+                if domain not in recomputed:
+                    for user, role in links or ():
+                        await self._add_link(session, ptype, domain, user, role)
+
+    async def _lock(
+        self: Self,
+        session: AsyncSession,
+        ptype: str,
+        domains: set[str] | None,
+    ) -> None:
+        """Lock the scopes of a ptype until the transaction ends, every domain if ``None``.
+
+        :param session: The session of the transaction.
+        :param ptype: The role ptype.
+        :param domains: The domains to refresh.
+        """
+        lock_table = self.lock_table
+        named = sorted(domain for domain in domains or () if domain)
+        for chunk in _chunked([NO_DOMAIN, *named], self._batch_size):
+            await session.execute(
+                _insert_ignoring_conflicts(
+                    lock_table,
+                    self._dialect,
+                    ["ptype", "domain"],
+                ),
+                [{"ptype": ptype, "domain": domain} for domain in chunk],
+            )
+        for stmt in self._lock_selects(ptype, domains):
+            await session.execute(stmt)
+
+    def _lock_selects(
+        self: Self,
+        ptype: str,
+        domains: set[str] | None,
+    ) -> list[Select[Any]]:
+        """Build the statements locking the scopes of a ptype, see :meth:`_lock`."""
+        lock_table = self.lock_table
+        of_ptype = lock_table.c.ptype == ptype
+        whole_ptype = domains is None or NO_DOMAIN in domains
+        selects = [
+            select(lock_table.c.domain)
+            .where(of_ptype, lock_table.c.domain == NO_DOMAIN)
+            .with_for_update(read=not whole_ptype),
+        ]
+        named = sorted(domain for domain in domains or () if domain)
+        selects.extend(
+            select(lock_table.c.domain)
+            .where(of_ptype, lock_table.c.domain.in_(chunk))
+            .order_by(lock_table.c.domain)
+            .with_for_update()
+            for chunk in _chunked(named, self._batch_size)
+        )
+        return selects
+
+    async def _add_link(  # noqa: PLR0913
+        self: Self,
+        session: AsyncSession,
+        ptype: str,
+        domain: str,
+        user: str,
+        role: str,
+    ) -> None:
+        """Extend the closure of a domain with a new link.
+
+        Every user reaching ``user`` now reaches every role ``role`` reaches, and the pairs that were already
+        there may get a shorter distance.
+
+        :param session: The session of the transaction.
+        :param ptype: The role ptype.
+        :param domain: The domain of the link.
+        :param user: The user of the link.
+        :param role: The role of the link.
+        """
+        table = self.table
+        scope = (table.c.ptype == ptype, table.c.domain == domain)
+        ancestors: dict[str, int] = dict(
+            (
+                await session.execute(
+                    select(table.c.user, table.c.depth).where(
+                        *scope,
+                        table.c.role == user,
+                    ),
+                )
+            )
+            .tuples()
+            .all(),
+        )
+        ancestors[user] = 0
+        descendants: dict[str, int] = dict(
+            (
+                await session.execute(
+                    select(table.c.role, table.c.depth).where(
+                        *scope,
+                        table.c.user == role,
+                    ),
+                )
+            )
+            .tuples()
+            .all(),
+        )
+        descendants[role] = 0
+
+        stored: dict[tuple[str, str], tuple[int, int]] = {}
+        for users in _chunked(ancestors, self._batch_size):
+            stmt = select(table.c.id, table.c.user, table.c.role, table.c.depth).where(
+                *scope,
+                table.c.user.in_(users),
+            )
+            for row_id, closure_user, closure_role, depth in (
+                await session.execute(stmt)
+            ).tuples():
+                if closure_role in descendants:
+                    stored[closure_user, closure_role] = (row_id, depth)
+
+        missing: list[dict[str, Any]] = []
+        shorter: list[dict[str, Any]] = []
+        for ancestor, ancestor_depth in ancestors.items():
+            for descendant, descendant_depth in descendants.items():
+                depth = ancestor_depth + 1 + descendant_depth
+                row_id, stored_depth = stored.get((ancestor, descendant), (None, None))
+                if row_id is None:
+                    missing.append(
+                        {
+                            "ptype": ptype,
+                            "domain": domain,
+                            "user": ancestor,
+                            "role": descendant,
+                            "depth": depth,
+                        },
+                    )
+                elif depth < stored_depth:
+                    shorter.append({"row_id": row_id, "new_depth": depth})
+        for rows in _chunked(missing, self._batch_size):
+            await session.execute(insert(table), rows)
+        if shorter:
+            await session.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(depth=bindparam("new_depth")),
+                shorter,
+            )
+
+    async def _recompute(
+        self: Self,
+        session: AsyncSession,
+        ptype: str,
+        domains: set[str] | None,
+        rules: RuleReader,
+    ) -> None:
+        """Recompute the closure of the domains of a ptype, all of them if ``None``."""
+        links: dict[str, list[tuple[str, str]]] = {}
+        async for rows in rules(session, ptype, domains):
+            for row in rows:
+                links.setdefault(row[DOMAIN_INDEX + 1] or NO_DOMAIN, []).append(
+                    (row[1], row[2]),
+                )
+        wanted = {
+            (domain, user, role, depth)
+            for domain, domain_links in links.items()
+            for (user, role), depth in role_closure(domain_links).items()
+        }
+
+        table = self.table
+        stmt = select(
+            table.c.id,
+            table.c.domain,
+            table.c.user,
+            table.c.role,
+            table.c.depth,
+        ).where(table.c.ptype == ptype)
+        if domains is not None:
+            stmt = stmt.where(table.c.domain.in_(sorted(domains)))
+        stale: list[int] = []
+        for row_id, *row in (await session.execute(stmt)).tuples():
+            closure_row = tuple(row)
+            if closure_row in wanted:
+                wanted.discard(closure_row)
+            else:
+                stale.append(row_id)
+
+        for ids in _chunked(stale, self._batch_size):
+            await session.execute(delete(table).where(table.c.id.in_(ids)))
+        for closure_rows in _chunked(wanted, self._batch_size):
+            await session.execute(
+                insert(table),
+                [
+                    {
+                        "ptype": ptype,
+                        "domain": domain,
+                        "user": user,
+                        "role": role,
+                        "depth": depth,
+                    }
+                    for domain, user, role, depth in closure_rows
+                ],
+            )
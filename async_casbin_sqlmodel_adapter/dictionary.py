@@ -0,0 +1,191 @@
+"""String dictionary of the dictionary-encoded rule table of the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import select
+from typing_extensions import Self
+
+from .adapter import _chunked, _insert_ignoring_conflicts
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from sqlalchemy import Table
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Stands for a value missing from the dictionary: no rule references it, so nothing compared to it matches.
+UNKNOWN_ID = -1
+# Where the ids a transaction looked up or inserted are kept in its session until it commits.
+PENDING_KEY = "casbin_pending_string_ids"
+
+
+class StringDictionary:
+    """Cache of the string table mapping every distinct rule value to the integer id rules store.
+
+    Strings are only ever added and their ids never reused, so a known id always decodes to the same value.
+    Strings are inserted in the writer's transaction and the ids it learns are kept in its session until
+    :meth:`commit`, so a rolled back transaction cannot leave the id of a missing string in the cache.
+    """
+
+    def __init__(self: Self, table: Table, dialect: str, batch_size: int) -> None:
+        """Initialize an empty cache.
+
+        :param table: The string table, with ``id`` and ``value`` columns.
+        :param dialect: The name of the database dialect.
+        :param batch_size: How many values are looked up or inserted per statement.
+        """
+        self.table = table
+        self._dialect = dialect
+        self._batch_size = batch_size
+        self._ids: dict[str, int] = {}
+        # None decodes to itself, so rows are decoded by mapping every column.
+        self._values: dict[int | None, str | None] = {None: None}
+        self._last_id = 0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self: Self, session: AsyncSession) -> None:
+        """Fetch the strings added since the last refresh, all of them the first time."""
+        table = self.table
+        async with self._lock:
+            result = await session.execute(
+                select(table.c.id, table.c.value).where(table.c.id > self._last_id),
+            )
+            for string_id, value in result:
+                self._values[string_id] = value
+                self._ids[value] = string_id
+                self._last_id = max(self._last_id, string_id)
+
+    async def decode(
+        self: Self,
+        session: AsyncSession,
+        rows: Sequence[Sequence[Any]],
+        skip: int = 0,
+    ) -> list[tuple[Any, ...]]:
+        """Replace the string ids of rows with their values, fetching the ids missing from the cache.
+
+        :param session: The session the rows were read in.
+        :param rows: The rows to decode.
+        :param skip: How many leading columns are kept as is.
+        """
+        try:
+            return self._decode(rows, skip)
+        except KeyError:
+            pass
+        table = self.table
+        values = self._values
+        missing = {
+            string_id
+            for row in rows
+            for string_id in row[skip:]
+            if string_id not in values
+        }
+        for chunk in _chunked(missing, self._batch_size):
+            result = await session.execute(
+                select(table.c.id, table.c.value).where(table.c.id.in_(chunk)),
+            )
+            values.update(result.tuples().all())
+        return self._decode(rows, skip)
+
+    def _decode(
+        self: Self,
+        rows: Sequence[Sequence[Any]],
+        skip: int,
+    ) -> list[tuple[Any, ...]]:
+        """Decode rows from the cache only.
+
+        :raises KeyError: If an id is missing from the cache.
+        """
+        get = self._values.__getitem__
+        if skip:
+            return [(*row[:skip], *map(get, row[skip:])) for row in rows]
+        return [tuple(map(get, row)) for row in rows]
+
+    async def encode(
+        self: Self,
+        session: AsyncSession,
+        values: Iterable[str | None],
+        *,
+        create: bool,
+    ) -> dict[str, int]:
+        """Return the ids of values, looking up the ones missing from the cache.
+
+        :param session: The session of the transaction the ids are used in.
+        :param values: The values to encode, ``None`` is ignored.
+        :param create: Whether the values missing from the table are inserted, or left out of the result.
+        """
+        pending: dict[str, int] = session.info.setdefault(PENDING_KEY, {})
+        ids: dict[str, int] = {}
+        missing: set[str] = set()
+        for value in values:
+            if value is None or value in ids:
+                continue
+            string_id = pending.get(value) or self._ids.get(value)
+            if string_id is None:
+                missing.add(value)
+            else:
+                ids[value] = string_id
+        if not missing:
+            return ids
+
+        found = await self._select_ids(session, missing)
+        if create and len(found) < len(missing):
+            new = [{"value": value} for value in missing if value not in found]
+            for chunk in _chunked(new, self._batch_size):
+                await session.execute(
+                    _insert_ignoring_conflicts(self.table, self._dialect, ["value"]),
+                    chunk,
+                )
+            found.update(await self._select_ids(session, missing.difference(found)))
+        pending.update(found)
+        ids.update(found)
+        return ids
+
+    async def encode_rows(
+        self: Self,
+        session: AsyncSession,
+        rows: Iterable[Sequence[str | None]],
+        *,
+        create: bool,
+    ) -> list[tuple[int | None, ...]]:
+        """Replace the values of rows with their ids, :data:`UNKNOWN_ID` for the ones missing from the table.
+
+        :param session: The session of the transaction the rows are used in.
+        :param rows: The rows to encode.
+        :param create: Whether the values missing from the table are inserted.
+        """
+        rows = list(rows)
+        ids = await self.encode(
+            session,
+            (value for row in rows for value in row),
+            create=create,
+        )
+        return [
+            tuple(
+                None if value is None else ids.get(value, UNKNOWN_ID) for value in row
+            )
+            for row in rows
+        ]
+
+    def commit(self: Self, session: AsyncSession) -> None:
+        """Cache the ids a transaction learned, once it committed."""
+        for value, string_id in session.info.pop(PENDING_KEY, {}).items():
+            self._ids[value] = string_id
+            self._values[string_id] = value
+
+    async def _select_ids(
+        self: Self,
+        session: AsyncSession,
+        values: Iterable[str],
+    ) -> dict[str, int]:
+        """Look the ids of values up in the table."""
+        table = self.table
+        found: dict[str, int] = {}
+        for chunk in _chunked(values, self._batch_size):
+            result = await session.execute(
+                select(table.c.value, table.c.id).where(table.c.value.in_(chunk)),
+            )
+            found.update(result.tuples().all())
+        return found
@@ -0,0 +1,179 @@
+"""Per-domain lazy loading for multi-tenant policies stored through the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import TYPE_CHECKING, NamedTuple
+
+from casbin import AsyncEnforcer
+from typing_extensions import Self
+
+from .adapter import AdapterError, Filter, _check_positive
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from casbin import Model
+
+    from .adapter import Adapter
+
+DEFAULT_MAX_DOMAINS = 128
+# ``p, sub, dom, obj, act`` and ``g, user, role, dom``
+DEFAULT_DOMAIN_FIELDS = {"p": 1, "g": 2}
+
+
+class DomainCacheStats(NamedTuple):
+    """Counters of a :class:`DomainEnforcers` cache."""
+
+    hits: int
+    misses: int
+    shared_loads: int
+    evictions: int
+    domains: int
+    rules: int
+
+
+def _rule_count(model: Model) -> int:
+    """Count the rules loaded into a model."""
+    return sum(
+        len(assertion.policy)
+        for sec in ("p", "g")
+        for assertion in model.model.get(sec, {}).values()
+    )
+
+
+class DomainEnforcers:
+    """Bounded LRU of enforcers that each hold the rules of a single domain, loaded on first use.
+
+    A domain's rules are loaded with filtered loads on the column holding the domain of every ptype, concurrent
+    first requests for the same domain share a single load and the least recently used domains are evicted when
+    there are more than ``max_domains`` domains or ``max_rules`` rules cached.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        adapter: Adapter,
+        model: str | Model,
+        *,
+        max_domains: int = DEFAULT_MAX_DOMAINS,
+        max_rules: int | None = None,
+        domain_fields: Mapping[str, int] | None = None,
+    ) -> None:
+        """Initialize the cache.
+
+        :param adapter: The adapter to load the rules with.
+        :param model: The casbin model path or model shared by every domain enforcer, a model is copied for
+            every domain.
+        :param max_domains: How many domains to keep loaded at most.
+        :param max_rules: How many rules to keep loaded at most, as an estimate of the memory used.
+        :param domain_fields: The index of the domain value for each ptype, ``p`` rules are matched on ``v1``
+            and ``g`` rules on ``v2`` if not provided. Ptypes without a domain are not loaded.
+
+        :raises AdapterError: If max_domains or max_rules is lower than one.
+        """
+        _check_positive("max_domains", max_domains)
+        if max_rules is not None:
+            _check_positive("max_rules", max_rules)
+
+        self._adapter = adapter
+        self._model = model
+        self._max_domains = max_domains
+        self._max_rules = max_rules
+        fields: dict[int, list[str]] = {}
+        for ptype, index in (domain_fields or DEFAULT_DOMAIN_FIELDS).items():
+            if not 0 <= index < len(adapter.cols) - 1:
+                msg = f"Invalid domain field index for {ptype}: {index}."
+                raise AdapterError(msg)
+            fields.setdefault(index, []).append(ptype)
+        self._domain_fields = fields
+        self._enforcers: OrderedDict[str, tuple[AsyncEnforcer, int]] = OrderedDict()
+        self._loading: dict[str, asyncio.Task[AsyncEnforcer]] = {}
+        self._rules = 0
+        self._hits = 0
+        self._misses = 0
+        self._shared_loads = 0
+        self._evictions = 0
+
+    @property
+    def stats(self: Self) -> DomainCacheStats:
+        """Return the cache counters and how many domains and rules are loaded."""
+        return DomainCacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            shared_loads=self._shared_loads,
+            evictions=self._evictions,
+            domains=len(self._enforcers),
+            rules=self._rules,
+        )
+
+    def domain_filters(self: Self, domain: str) -> list[Filter]:
+        """Return the filters selecting the rules of a domain.
+
+        :param domain: The domain.
+        """
+        return [
+            Filter(ptype=ptypes, **{f"v{index}": [domain]})
+            for index, ptypes in self._domain_fields.items()
+        ]
+
+    async def get(self: Self, domain: str) -> AsyncEnforcer:
+        """Return the enforcer holding the rules of a domain, loading them on first use.
+
+        :param domain: The domain.
+
+        :return: An enforcer whose policy is limited to the domain.
+        """
+        cached = self._enforcers.get(domain)
+        if cached is not None:
+            self._enforcers.move_to_end(domain)
+            self._hits += 1
+            return cached[0]
+
+        task = self._loading.get(domain)
+        if task is None:
+            self._misses += 1
+            task = asyncio.get_running_loop().create_task(self._load(domain))
+            self._loading[domain] = task
+            task.add_done_callback(lambda _: self._loading.pop(domain, None))
+        else:
+            self._shared_loads += 1
+        # A cancelled caller must not cancel the load the other callers wait for.
+        return await asyncio.shield(task)
+
+    def invalidate(self: Self, domain: str | None = None) -> None:
+        """Drop a loaded domain so its rules are loaded again on next use.
+
+        :param domain: The domain to drop, every domain is dropped if not provided.
+        """
+        domains = list(self._enforcers) if domain is None else [domain]
+        for name in domains:
+            entry = self._enforcers.pop(name, None)
+            if entry is not None:
+                self._rules -= entry[1]
+
+    async def _load(self: Self, domain: str) -> AsyncEnforcer:
+        """Load a domain into a new enforcer and cache it, evicting the least recently used domains."""
+        enforcer = AsyncEnforcer(self._copy_model(), self._adapter)
+        await enforcer.load_filtered_policy(self.domain_filters(domain))
+        rules = _rule_count(enforcer.get_model())
+
+        self.invalidate(domain)
+        self._enforcers[domain] = (enforcer, rules)
+        self._rules += rules
+        while len(self._enforcers) > 1 and (
+            len(self._enforcers) > self._max_domains
+            or (self._max_rules is not None and self._rules > self._max_rules)
+        ):
+            _, (_, evicted_rules) = self._enforcers.popitem(last=False)
+            self._rules -= evicted_rules
+            self._evictions += 1
+        return enforcer
+
+    def _copy_model(self: Self) -> str | Model:
+        """Return the model for a new domain enforcer."""
+        if isinstance(self._model, str):
+            return self._model
+        model = self._model.__class__()
+        model.load_model_from_text(self._model.to_text())
+        return model
@@ -0,0 +1,138 @@
+"""Per-operation metrics for the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import functools
+import logging
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, NamedTuple, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Coroutine
+
+    from .adapter import Adapter
+
+logger = logging.getLogger(__name__)
+
+_R = TypeVar("_R")
+
+
+class OperationMetrics(NamedTuple):
+    """What an adapter operation cost, passed to the hooks once it finished."""
+
+    operation: str
+    seconds: float
+    rows: int
+    statements: int
+    pool_wait_seconds: float
+    error: BaseException | None
+
+
+OperationHook = Callable[[OperationMetrics], Any]
+
+
+class _OperationStats:
+    """Counters of the operation running in the current context."""
+
+    __slots__ = ("adapter", "pool_wait", "rows", "statements")
+
+    def __init__(self: _OperationStats, adapter: Adapter) -> None:
+        self.adapter = adapter
+        self.rows = 0
+        self.statements = 0
+        self.pool_wait = 0.0
+
+
+_current_operation: ContextVar[_OperationStats | None] = ContextVar(
+    "casbin_adapter_operation",
+    default=None,
+)
+
+
+def current_operation() -> _OperationStats | None:
+    """Return the counters of the instrumented operation running in the current context, if any."""
+    return _current_operation.get()
+
+
+def count_rows(rows: int) -> None:
+    """Add rows read or written to the instrumented operation running in the current context, if any."""
+    stats = _current_operation.get()
+    if stats is not None:
+        stats.rows += rows
+
+
+def _call_hook(hook: OperationHook, metrics: OperationMetrics) -> None:
+    """Pass metrics to a hook, logging its exceptions."""
+    try:
+        hook(metrics)
+    except Exception:
+        logger.exception("Adapter instrumentation hook %r failed", hook)
+
+
+def instrumented(
+    func: Callable[..., Coroutine[Any, Any, _R]],
+) -> Callable[..., Coroutine[Any, Any, _R]]:
+    """Report the metrics of an adapter method to the adapter's hooks.
+
+    Without hooks, or when called from another instrumented method, the method runs as is.
+    """
+    operation = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(self: Adapter, *args: Any, **kwargs: Any) -> _R:  # noqa: ANN401
+        if not self._hooks or _current_operation.get() is not None:
+            return await func(self, *args, **kwargs)
+
+        stats = _OperationStats(self)
+        token = _current_operation.set(stats)
+        error: BaseException | None = None
+        started = time.perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            _current_operation.reset(token)
+            metrics = OperationMetrics(
+                operation=operation,
+                seconds=seconds,
+                rows=stats.rows,
+                statements=stats.statements,
+                pool_wait_seconds=stats.pool_wait,
+                error=error,
+            )
+            for hook in list(self._hooks):
+                _call_hook(hook, metrics)
+
+    return wrapper
+
+
+def opentelemetry_hook(tracer: Any) -> OperationHook:  # noqa: ANN401
+    """Build a hook recording every operation as an OpenTelemetry span.
+
+    :param tracer: An OpenTelemetry tracer, such as ``opentelemetry.trace.get_tracer(__name__)``.
+
+    :return: A hook to pass to :meth:`Adapter.add_hook`.
+    """
+
+    def hook(metrics: OperationMetrics) -> None:
+        end = time.time_ns()
+        span = tracer.start_span(
+            f"casbin.{metrics.operation}",
+            start_time=end - int(metrics.seconds * 1e9),
+            attributes={
+                "casbin.operation": metrics.operation,
+                "casbin.rows": metrics.rows,
+                "db.statement_count": metrics.statements,
+                "db.pool_wait_seconds": metrics.pool_wait_seconds,
+            },
+        )
+        if metrics.error is not None:
+            span.record_exception(metrics.error)
+        span.end(end_time=end)
+
+    return hook
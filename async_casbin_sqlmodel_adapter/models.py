@@ -2,11 +2,129 @@
 
 from __future__ import annotations
 
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import Index, String, func
 from sqlmodel import Field, SQLModel
 from typing_extensions import Self
 
+if TYPE_CHECKING:
+    from sqlalchemy import ColumnElement, Dialect, Table
+
+# Column sets worth indexing on a rule table, as ``(suffix, columns, unique)``. Filtered loads and removals
+# on ``(ptype, v0)`` are served by the leftmost prefix of the unique rule key, so it needs no index of its own.
+RULE_INDEXES: tuple[tuple[str, tuple[str, ...], bool], ...] = (
+    ("ptype_v1", ("ptype", "v1"), False),
+    ("rule", ("ptype", "v0", "v1", "v2", "v3", "v4", "v5"), True),
+)
+# How many leading columns of a unique key are indexed as they are, the lookups are served by their prefix.
+UNIQUE_KEY_PREFIX = 2
+# The ways a unique key is indexed: ``mysql`` (and MariaDB) replaces the columns after the prefix by a hash of
+# their values, since index keys are limited to 3072 bytes there; ``mssql`` indexes the columns, since its unique
+# indexes already treat NULLs as equal; ``default`` compares the NULLs of the nullable columns as empty values,
+# since PostgreSQL and SQLite let a unique index hold any number of rows only differing by NULLs.
+UNIQUE_KEY_VARIANTS = ("mysql", "mssql", "default")
+# Separates the hashed values of a MySQL unique key, so that ("a b", "c") and ("a", "b c") differ.
+HASHED_VALUES_SEPARATOR = "\x1f"
+
+
+def rule_index_name(tablename: str, suffix: str, *, unique: bool) -> str:
+    """Return the name of a rule table index.
+
+    :param tablename: The name of the rule table.
+    :param suffix: The suffix from ``RULE_INDEXES``.
+    :param unique: Whether the index is unique.
+    """
+    return f"{'uq' if unique else 'ix'}_{tablename}_{suffix}"
+
+
+def unique_key_variant(dialect_name: str) -> str:
+    """Return how a unique key is indexed on a dialect, one of ``UNIQUE_KEY_VARIANTS``.
+
+    :param dialect_name: The name of the dialect.
+    """
+    if dialect_name in {"mysql", "mariadb"}:
+        return "mysql"
+    if dialect_name == "mssql":
+        return "mssql"
+    return "default"
+
+
+def _is_string(column: ColumnElement[Any]) -> bool:
+    """Return whether a column holds strings, including SQLModel's ``AutoString`` columns."""
+    return isinstance(column.type, String) or isinstance(
+        getattr(column.type, "impl", None),
+        String,
+    )
+
+
+def _empty_value(column: ColumnElement[Any]) -> Any:  # noqa: ANN401
+    """Return the value the NULLs of a column are compared as in a unique key."""
+    return "" if _is_string(column) else 0
+
+
+def unique_key(
+    table: Table,
+    columns: tuple[str, ...],
+    variant: str,
+) -> list[ColumnElement[Any]]:
+    """Return the key parts of a unique index over columns of a table, for a variant of ``UNIQUE_KEY_VARIANTS``.
+
+    :param table: The indexed table.
+    :param columns: The names of the columns the key is unique over.
+    :param variant: How the key is indexed.
+    """
+    prefix = [table.c[name] for name in columns[:UNIQUE_KEY_PREFIX]]
+    rest = [table.c[name] for name in columns[UNIQUE_KEY_PREFIX:]]
+    if variant == "mssql" or not rest:
+        return [*prefix, *rest]
+    values = [
+        func.coalesce(column, _empty_value(column)) if column.nullable else column
+        for column in rest
+    ]
+    if variant == "mysql" and all(_is_string(column) for column in rest):
+        return [*prefix, func.md5(func.concat_ws(HASHED_VALUES_SEPARATOR, *values))]
+    return [*prefix, *values]
+
+
+def _creates_variant(
+    variant: str,
+    *_args: object,
+    dialect: Dialect,
+    **_kwargs: object,
+) -> bool:
+    """Return whether the index of a unique key variant is created on a dialect."""
+    return unique_key_variant(dialect.name) == variant
+
 
-class CasbinRule(SQLModel, table=True):  # type: ignore[call-arg]
+def add_unique_key(table: Table, name: str, columns: tuple[str, ...]) -> None:
+    """Declare a unique key on a table, indexed by the variant of the dialect the table is created on.
+
+    :param table: The table to declare the key on.
+    :param name: The name of the index.
+    :param columns: The names of the columns the key is unique over.
+    """
+    for variant in UNIQUE_KEY_VARIANTS:
+        Index(name, *unique_key(table, columns, variant), unique=True).ddl_if(
+            callable_=partial(_creates_variant, variant),
+        )
+
+
+def add_rule_indexes(table: Table) -> None:
+    """Declare the ``RULE_INDEXES`` on a rule table.
+
+    :param table: The rule table.
+    """
+    for suffix, columns, unique in RULE_INDEXES:
+        name = rule_index_name(table.name, suffix, unique=unique)
+        if unique:
+            add_unique_key(table, name, columns)
+        else:
+            Index(name, *(table.c[column] for column in columns))
+
+
+class CasbinRule(SQLModel, table=True):
     """CasbinRule class for SQLModel-based Casbin adapter."""
 
     __tablename__ = "casbin_rule"
@@ -33,3 +151,122 @@ class CasbinRule(SQLModel, table=True):  # type: ignore[call-arg]
     def __repr__(self: Self) -> str:
         """Return the string representation of the CasbinRule."""
         return f'<CasbinRule {self.id}: "{self!s}">'
+
+
+add_rule_indexes(CasbinRule.__table__)  # type: ignore[attr-defined]
+
+
+class CasbinString(SQLModel, table=True):
+    """Distinct rule value, referenced by its id from the rules of :class:`CasbinEncodedRule`."""
+
+    __tablename__ = "casbin_string"
+    # Never reuse the id of a deleted string, adapters cache what every id decodes to.
+    __table_args__ = {"sqlite_autoincrement": True}  # noqa: RUF012
+
+    id: int | None = Field(default=None, primary_key=True)
+    value: str = Field(max_length=255, unique=True)
+
+
+class CasbinEncodedRule(SQLModel, table=True):
+    """Dictionary-encoded rule: ``ptype, v0..v5`` hold ids of :class:`CasbinString` rows instead of strings.
+
+    Use it with ``Adapter(engine, db_class=CasbinEncodedRule, string_class=CasbinString)``, rows and their
+    indexes then take a few integers per rule whatever the length of its values.
+    """
+
+    __tablename__ = "casbin_rule_encoded"
+
+    id: int = Field(primary_key=True)
+    ptype: int = Field(foreign_key="casbin_string.id")
+    v0: int = Field(foreign_key="casbin_string.id")
+    v1: int = Field(foreign_key="casbin_string.id")
+    v2: int | None = Field(foreign_key="casbin_string.id", default=None)
+    v3: int | None = Field(foreign_key="casbin_string.id", default=None)
+    v4: int | None = Field(foreign_key="casbin_string.id", default=None)
+    v5: int | None = Field(foreign_key="casbin_string.id", default=None)
+
+
+add_rule_indexes(CasbinEncodedRule.__table__)  # type: ignore[attr-defined]
+
+
+class CasbinRoleClosure(SQLModel, table=True):
+    """Role a user inherits through the ``g`` rules of a role ptype, directly or transitively.
+
+    Maintained by ``Adapter(engine, closure_class=CasbinRoleClosure)`` on every write. ``domain`` is empty for
+    the rules without one and ``depth`` is the length of the shortest inheritance chain, 1 for a direct role.
+    """
+
+    __tablename__ = "casbin_role_closure"
+
+    id: int | None = Field(default=None, primary_key=True)
+    ptype: str = Field(max_length=255)
+    domain: str = Field(max_length=255, default="")
+    user: str = Field(max_length=255)
+    role: str = Field(max_length=255)
+    depth: int
+
+
+add_unique_key(
+    CasbinRoleClosure.__table__,  # type: ignore[attr-defined]
+    "uq_casbin_role_closure_user_role",
+    ("ptype", "domain", "user", "role"),
+)
+
+
+class CasbinRoleClosureLock(SQLModel, table=True):
+    """Row locked by the writers refreshing the :class:`CasbinRoleClosure` of a role ptype and domain.
+
+    The row of the empty domain guards the whole ptype: it is locked in shared mode while a domain is refreshed
+    and exclusively while every domain is. Created with the closure table.
+    """
+
+    __tablename__ = "casbin_role_closure_lock"
+
+    ptype: str = Field(max_length=255, primary_key=True)
+    domain: str = Field(max_length=255, primary_key=True, default="")
+
+
+class CasbinRuleChange(SQLModel, table=True):
+    """Changelog entry recorded by the adapter for every policy write it makes.
+
+    ``op`` is one of ``add``, ``remove``, ``remove_filtered`` (``v0..v5`` then hold the field values starting
+    at ``field_index``) or ``save`` (a full rewrite, which carries no rule).
+    """
+
+    __tablename__ = "casbin_rule_changelog"
+    # Never reuse the revision of a deleted entry, revisions must only grow.
+    __table_args__ = {"sqlite_autoincrement": True}  # noqa: RUF012
+
+    revision: int | None = Field(default=None, primary_key=True)
+    op: str = Field(max_length=16)
+    ptype: str | None = Field(max_length=255, default=None)
+    v0: str | None = Field(max_length=255, default=None)
+    v1: str | None = Field(max_length=255, default=None)
+    v2: str | None = Field(max_length=255, default=None)
+    v3: str | None = Field(max_length=255, default=None)
+    v4: str | None = Field(max_length=255, default=None)
+    v5: str | None = Field(max_length=255, default=None)
+    field_index: int | None = Field(default=None)
+
+
+class CasbinChangelogHead(SQLModel, table=True):
+    """Latest revision handed out to the entries of a changelog table, such as :class:`CasbinRuleChange`.
+
+    Writers reserve the revisions of their entries by bumping this row, whose lock they hold until they commit,
+    so revisions become visible in the order they were handed out. Created with the changelog table.
+    """
+
+    __tablename__ = "casbin_changelog_head"
+
+    changelog: str = Field(max_length=255, primary_key=True)
+    revision: int = Field(default=0)
+
+
+class CasbinPolicyRevision(SQLModel, table=True):
+    """Single row holding the policy revision the watcher polls, bumped on every watcher update."""
+
+    __tablename__ = "casbin_policy_revision"
+
+    id: int = Field(primary_key=True)
+    revision: int = Field(default=0)
+    origin: str | None = Field(max_length=64, default=None)
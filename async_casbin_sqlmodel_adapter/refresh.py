@@ -0,0 +1,204 @@
+"""Double-buffered background policy refresh for enforcers using the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import copy
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from typing_extensions import Self
+
+from .adapter import Adapter, AdapterError, _check_seconds
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from types import TracebackType
+
+    from casbin import AsyncEnforcer, Model
+
+    from .adapter import Filter
+
+logger = logging.getLogger(__name__)
+
+# How many times a load is retried when the adapter committed a write the shadow model may have missed.
+MAX_LOAD_ATTEMPTS = 3
+
+
+class PolicyRefresher:
+    """Reload an enforcer's policy into a shadow model in the background and swap it in at once.
+
+    ``enforcer.load_policy`` rebuilds the role managers the enforcer is using and, for filtered loads, clears
+    the model before filling it again, so concurrent ``enforce`` calls can see a partial policy. The refresher
+    loads the rules into a new model, builds its role links on copies of the enforcer's role managers in a
+    worker thread, then replaces the model and role managers in a single step on the event loop. A load that
+    fails leaves the enforcer serving the previous policy.
+    """
+
+    def __init__(
+        self: Self,
+        enforcer: AsyncEnforcer,
+        *,
+        interval: float | None = None,
+        filter_: Filter | Iterable[Filter] | None = None,
+    ) -> None:
+        """Initialize the refresher.
+
+        :param enforcer: The enforcer whose policy is refreshed, using an :class:`Adapter`.
+        :param interval: How many seconds to wait between two refreshes once started, only :meth:`refresh`
+            refreshes the policy if not provided.
+        :param filter_: The filters the policy is loaded with, the whole policy is loaded if not provided.
+
+        :raises AdapterError: If the enforcer does not use an Adapter or the interval is not positive.
+        """
+        adapter = enforcer.get_adapter()
+        if not isinstance(adapter, Adapter):
+            msg = "PolicyRefresher requires an enforcer using the SQLModel Adapter."
+            raise AdapterError(msg)
+        _check_seconds("interval", interval)
+
+        self._enforcer = enforcer
+        self._adapter = adapter
+        self._interval = interval
+        self._filter = filter_
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self.refreshes = 0
+        self.last_error: Exception | None = None
+
+    async def __aenter__(self: Self) -> Self:
+        """Start refreshing periodically."""
+        self.start()
+        return self
+
+    async def __aexit__(
+        self: Self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Stop refreshing."""
+        await self.aclose()
+
+    def start(self: Self) -> None:
+        """Refresh the policy every ``interval`` seconds, starting after the first interval.
+
+        :raises AdapterError: If the refresher was created without an interval.
+        """
+        if self._interval is None:
+            msg = "The refresher was created without an interval."
+            raise AdapterError(msg)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def aclose(self: Self) -> None:
+        """Stop the periodic refreshes, waiting for the running one."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def refresh(self: Self) -> None:
+        """Load the policy into a shadow model and swap it into the enforcer.
+
+        Concurrent calls run one after the other, since a load that started earlier may miss the latest writes.
+        It can be used as a :class:`Watcher` update callback.
+
+        :raises Exception: Whatever the load raised, the enforcer keeps its previous policy then.
+        """
+        async with self._lock:
+            try:
+                model, rm_map, cond_rm_map = await self._load()
+            except Exception as exc:
+                self.last_error = exc
+                raise
+            enforcer = self._enforcer
+            enforcer.model = model
+            enforcer.rm_map = rm_map
+            enforcer.cond_rm_map = cond_rm_map
+            self.refreshes += 1
+            self.last_error = None
+
+    async def _load(self: Self) -> tuple[Model, dict[str, Any], dict[str, Any]]:
+        """Load the policy and build its role links without touching the enforcer.
+
+        :raises AdapterError: If the adapter kept committing writes during every load attempt.
+        """
+        for _ in range(MAX_LOAD_ATTEMPTS):
+            started = time.monotonic()
+            model = self._new_model()
+            if self._filter is None:
+                await self._adapter.load_policy(model)
+            else:
+                await self._adapter.load_filtered_policy(model, self._filter)
+            if self._changed_since(started):
+                continue
+            rm_map, cond_rm_map = self._role_managers()
+            await asyncio.to_thread(self._build, model, rm_map, cond_rm_map)
+            if not self._changed_since(started):
+                return model, rm_map, cond_rm_map
+        msg = f"The policy kept changing during {MAX_LOAD_ATTEMPTS} load attempts."
+        raise AdapterError(msg)
+
+    def _changed_since(self: Self, started: float) -> bool:
+        """Return whether the adapter committed a write since a load started.
+
+        The enforcer applied such a write to its current model, but the shadow model may have missed it.
+        """
+        return self._adapter._last_write >= started  # noqa: SLF001
+
+    def _new_model(self: Self) -> Model:
+        """Return an empty copy of the enforcer's model."""
+        current = self._enforcer.get_model()
+        model = current.__class__()
+        model.load_model_from_text(current.to_text())
+        return model
+
+    def _role_managers(self: Self) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Return empty copies of the enforcer's role managers, unless it does not rebuild role links on load.
+
+        The copies keep the matching functions of the enforcer's role managers, and clearing them only rebinds
+        their own attributes.
+        """
+        enforcer = self._enforcer
+        if not enforcer.auto_build_role_links:
+            return enforcer.rm_map, enforcer.cond_rm_map
+        rm_map = {ptype: copy.copy(rm) for ptype, rm in enforcer.rm_map.items()}
+        cond_rm_map = {
+            ptype: copy.copy(rm) for ptype, rm in enforcer.cond_rm_map.items()
+        }
+        for rm in (*rm_map.values(), *cond_rm_map.values()):
+            rm.clear()
+        return rm_map, cond_rm_map
+
+    def _build(
+        self: Self,
+        model: Model,
+        rm_map: dict[str, Any],
+        cond_rm_map: dict[str, Any],
+    ) -> None:
+        """Sort the policy of a shadow model and build its role links, in a worker thread."""
+        for ptype, assertion in model.model.get("g", {}).items():
+            assertion.rm = rm_map.get(ptype)
+            assertion.cond_rm = cond_rm_map.get(ptype)
+        model.sort_policies_by_subject_hierarchy()
+        model.sort_policies_by_priority()
+        if self._enforcer.auto_build_role_links:
+            if rm_map:
+                model.build_role_links(rm_map)
+            if cond_rm_map:
+                model.build_conditional_role_links(cond_rm_map)
+
+    async def _run(self: Self) -> None:
+        """Refresh the policy every interval, logging the failures."""
+        while True:
+            await asyncio.sleep(self._interval or 0)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception(
+                    "Failed to refresh the policy, keeping the previous one",
+                )
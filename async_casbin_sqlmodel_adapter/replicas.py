@@ -0,0 +1,94 @@
+"""Read-replica routing for the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+DEFAULT_REPLICA_RETRY_INTERVAL = 30.0
+
+
+class ReplicaSet:
+    """Read engines picked round-robin, skipping the ones whose connection failed recently.
+
+    A replica that failed is left out for ``retry_interval`` seconds, then tried again by the next read.
+    """
+
+    def __init__(
+        self: Self,
+        engines: Iterable[AsyncEngine | str],
+        retry_interval: float = DEFAULT_REPLICA_RETRY_INTERVAL,
+        engine_options: Mapping[str, Any] | None = None,
+    ) -> None:
+        """Initialize the set with every replica healthy.
+
+        :param engines: The replica engines, or strings which can be used to create them.
+        :param retry_interval: How many seconds a failed replica is left out.
+        :param engine_options: The ``create_async_engine`` arguments of the engines created from strings.
+        """
+        self.engines: list[AsyncEngine] = []
+        self._owned: list[AsyncEngine] = []
+        for engine in engines:
+            if isinstance(engine, str):
+                self._owned.append(
+                    create_async_engine(engine, future=True, **(engine_options or {})),
+                )
+                self.engines.append(self._owned[-1])
+            else:
+                self.engines.append(engine)
+        self._retry_interval = retry_interval
+        self._session_makers = [
+            async_sessionmaker(
+                engine,
+                expire_on_commit=False,
+                autoflush=False,
+            )
+            for engine in self.engines
+        ]
+        self._down_until = [0.0] * len(self.engines)
+        self._next = 0
+
+    def __len__(self: Self) -> int:
+        """Return how many replicas the set holds."""
+        return len(self.engines)
+
+    def healthy(self: Self) -> list[int]:
+        """Return the indexes of the replicas to try for a read, in order, and move the round-robin on.
+
+        :return: The replicas that did not fail recently, starting with the next one in turn.
+        """
+        now = time.monotonic()
+        count = len(self.engines)
+        start, self._next = self._next, (self._next + 1) % count
+        return [
+            index
+            for index in ((start + offset) % count for offset in range(count))
+            if self._down_until[index] <= now
+        ]
+
+    def session(self: Self, index: int) -> AsyncSession:
+        """Open a session on a replica.
+
+        :param index: The index of the replica.
+        """
+        return self._session_makers[index]()
+
+    def mark_down(self: Self, index: int) -> None:
+        """Leave a replica out for ``retry_interval`` seconds.
+
+        :param index: The index of the replica that failed.
+        """
+        self._down_until[index] = time.monotonic() + self._retry_interval
+
+    async def dispose(self: Self) -> None:
+        """Close the connections of the replicas created from strings, the ones passed in are left open."""
+        for engine in self._owned:
+            await engine.dispose()
@@ -0,0 +1,186 @@
+"""Compact on-disk snapshot of a loaded policy for the SQLModel-based Casbin adapter.
+
+A snapshot is a single file made of a header, a dictionary of every distinct string and the rules as rows of
+seven native integers indexing that dictionary (``-1`` for ``None``)::
+
+    header | key | string offsets (uint32) | utf-8 strings | padding | rule rows (int32)
+
+The file is read through ``mmap``, so processes on the same host share its pages, and is replaced atomically,
+so readers never see a partially written snapshot.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+MAGIC = b"CSBNSNP1"
+ROW_WIDTH = 7
+# magic, little endian flag, key length, string count, row count
+HEADER = struct.Struct("<8s?HIQ")
+BYTEORDER_LITTLE = sys.byteorder == "little"
+
+
+class SnapshotWriter:
+    """Dictionary-encode rule rows and write them as a snapshot file."""
+
+    def __init__(self: Self) -> None:
+        """Initialize an empty snapshot."""
+        self._strings: dict[str, int] = {}
+        self._rows = array("i")
+
+    def add_rows(self: Self, rows: Iterable[Sequence[str | None]]) -> None:
+        """Add ``(ptype, v0..v5)`` rows to the snapshot.
+
+        :param rows: The rows to add.
+        """
+        strings = self._strings
+        for row in rows:
+            for value in row:
+                if value is None:
+                    self._rows.append(-1)
+                    continue
+                index = strings.get(value)
+                if index is None:
+                    index = strings[value] = len(strings)
+                self._rows.append(index)
+
+    def write(self: Self, path: str | os.PathLike[str], key: str) -> None:
+        """Write the snapshot atomically, replacing any existing file.
+
+        :param path: The snapshot file.
+        :param key: What the snapshot is valid for, such as the table revision it was loaded at.
+        """
+        encoded_key = key.encode()
+        blobs = [value.encode() for value in self._strings]
+        offsets = array("I", [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        header = HEADER.pack(
+            MAGIC,
+            BYTEORDER_LITTLE,
+            len(encoded_key),
+            len(blobs),
+            len(self._rows) // ROW_WIDTH,
+        )
+        strings_end = (
+            HEADER.size
+            + len(encoded_key)
+            + offsets.itemsize * len(offsets)
+            + offsets[-1]
+        )
+
+        # A private temporary file per write, so concurrent loads never write to or replace the same file.
+        descriptor, tmp_name = tempfile.mkstemp(
+            dir=Path(path).parent,
+            prefix=f"{Path(path).name}.",
+            suffix=".tmp",
+        )
+        tmp_path = Path(tmp_name)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(header)
+                file.write(encoded_key)
+                offsets.tofile(file)
+                file.write(b"".join(blobs))
+                file.write(b"\0" * (-strings_end % self._rows.itemsize))
+                self._rows.tofile(file)
+            tmp_path.replace(os.fspath(path))
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+
+def read_snapshot(
+    path: str | os.PathLike[str],
+    key: str,
+) -> Iterator[tuple[str | None, ...]] | None:
+    """Open a snapshot and iterate its ``(ptype, v0..v5)`` rows, if it exists and was written for ``key``.
+
+    :param path: The snapshot file.
+    :param key: The key the snapshot must have been written with.
+
+    :return: An iterator over the rows, or ``None`` when the snapshot is missing, stale or unreadable.
+    """
+    try:
+        with Path(path).open("rb") as file:
+            snapshot = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        layout = _read_layout(snapshot, key.encode())
+    except (struct.error, ValueError, TypeError):
+        layout = None
+    if layout is None:
+        snapshot.close()
+        return None
+    strings, rows_start, rows_end = layout
+    return _iter_rows(snapshot, strings, rows_start, rows_end)
+
+
+def _read_layout(
+    snapshot: mmap.mmap,
+    encoded_key: bytes,
+) -> tuple[list[str], int, int] | None:
+    """Check the header, key and size of a snapshot and decode its string dictionary.
+
+    :return: The strings and the byte range of the rule rows, or ``None`` when the snapshot does not match.
+    """
+    magic, little, key_length, string_count, row_count = HEADER.unpack_from(snapshot)
+    offsets_start = HEADER.size + key_length
+    offsets_end = offsets_start + 4 * (string_count + 1)
+    if (
+        magic != MAGIC
+        or little != BYTEORDER_LITTLE
+        or snapshot[HEADER.size : offsets_start] != encoded_key
+        or len(snapshot) < offsets_end
+    ):
+        return None
+    with memoryview(snapshot) as view:
+        with view[offsets_start:offsets_end].cast("I") as offsets:
+            bounds = [offsets_end + end for end in offsets]
+        rows_start = bounds[-1]
+        rows_start += -rows_start % 4
+        rows_end = rows_start + 4 * ROW_WIDTH * row_count
+        # A truncated or padded file would otherwise load a subset of the rules without any error.
+        if len(snapshot) != rows_end or any(
+            start > end for start, end in zip(bounds, bounds[1:])
+        ):
+            return None
+        strings = [
+            str(view[start:end], "utf-8") for start, end in zip(bounds, bounds[1:])
+        ]
+        with view[rows_start:rows_end].cast("i") as indexes:
+            if row_count and not (min(indexes) >= -1 and max(indexes) < string_count):
+                return None
+    return strings, rows_start, rows_end
+
+
+def _iter_rows(
+    snapshot: mmap.mmap,
+    strings: list[str],
+    rows_start: int,
+    rows_end: int,
+) -> Iterator[tuple[str | None, ...]]:
+    """Yield the rows of a validated snapshot, closing it afterwards."""
+    try:
+        with memoryview(snapshot) as view, view[rows_start:rows_end].cast("i") as rows:
+            for start in range(0, len(rows), ROW_WIDTH):
+                yield tuple(
+                    None if index < 0 else strings[index]
+                    for index in rows[start : start + ROW_WIDTH]
+                )
+    finally:
+        snapshot.close()
@@ -0,0 +1,181 @@
+"""CSV and JSONL policy files for the streaming import and export of the SQLModel-based Casbin adapter.
+
+CSV lines are casbin's policy file lines, ``p, alice, data1, read``, split on the commas outside ``()`` and ``[]``
+as casbin's file adapter does and never quoted. JSONL lines hold one rule object,
+``{"ptype": "p", "rule": ["alice", "data1", "read"]}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+from itertools import islice, takewhile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
+
+from .adapter import AdapterError
+
+if TYPE_CHECKING:
+    import os
+    from collections.abc import AsyncIterator, Iterable, Sequence
+
+PolicyFormat = Literal["csv", "jsonl"]
+
+FORMAT_SUFFIXES: dict[str, PolicyFormat] = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+RULE_WIDTH = 6
+
+
+def resolve_format(
+    path: str | os.PathLike[str],
+    policy_format: PolicyFormat | None,
+) -> PolicyFormat:
+    """Return the format of a policy file, from its suffix when not given.
+
+    :param path: The policy file.
+    :param policy_format: The requested format.
+
+    :raises AdapterError: If the format is unknown or cannot be told from the suffix.
+    """
+    if policy_format is None:
+        policy_format = FORMAT_SUFFIXES.get(Path(path).suffix.lower())
+        if policy_format is None:
+            msg = f"Cannot tell the format of {path}, pass format='csv' or 'jsonl'."
+            raise AdapterError(msg)
+    if policy_format not in {"csv", "jsonl"}:
+        msg = f"Unknown policy file format: {policy_format!r}."
+        raise AdapterError(msg)
+    return policy_format
+
+
+async def read_rows(
+    path: str | os.PathLike[str],
+    policy_format: PolicyFormat,
+    chunk_size: int,
+) -> AsyncIterator[list[tuple[str | None, ...]]]:
+    """Yield the ``(ptype, v0..v5)`` rows of a policy file in chunks, reading it off the event loop.
+
+    Blank lines and ``#`` comments are skipped.
+
+    :param path: The policy file.
+    :param policy_format: The format of the file.
+    :param chunk_size: How many lines are read at once.
+
+    :raises AdapterError: If a line is not a valid rule.
+    """
+    file = await asyncio.to_thread(Path(path).open, encoding="utf-8", newline="")
+    try:
+        line_number = 0
+        while lines := await asyncio.to_thread(_read_lines, file, chunk_size):
+            yield parse_lines(lines, policy_format, line_number)
+            line_number += len(lines)
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+def _read_lines(file: io.TextIOBase, count: int) -> list[str]:
+    """Read up to ``count`` lines."""
+    return list(islice(file, count))
+
+
+def parse_lines(
+    lines: Sequence[str],
+    policy_format: PolicyFormat,
+    first_line: int = 0,
+) -> list[tuple[str | None, ...]]:
+    """Parse policy file lines into ``(ptype, v0..v5)`` rows.
+
+    :param lines: The lines to parse.
+    :param policy_format: The format of the lines.
+    :param first_line: How many lines of the file come before them, for error messages.
+
+    :raises AdapterError: If a line is not a valid rule.
+    """
+    rows = []
+    for number, line in enumerate(lines, start=first_line + 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if policy_format == "csv":
+            ptype, *rule = _split_line(stripped)
+        else:
+            try:
+                item = json.loads(stripped)
+                ptype, rule = item["ptype"], item["rule"]
+            except (ValueError, KeyError, TypeError) as exc:
+                msg = f"Line {number} is not a JSON rule object."
+                raise AdapterError(msg) from exc
+        if not _valid_rule(ptype, rule):
+            msg = f"Line {number} is not a valid rule."
+            raise AdapterError(msg)
+        rows.append((ptype, *rule, *(None,) * (RULE_WIDTH - len(rule))))
+    return rows
+
+
+def _split_line(line: str) -> list[str]:
+    """Split a policy file line into its values, like casbin's ``load_policy_line``.
+
+    Commas inside ``()`` and ``[]`` belong to the value, such as the ``in ('a', 'b')`` of an ABAC rule.
+    """
+    if "(" not in line and "[" not in line:
+        return [value.strip() for value in line.split(",")]
+    values = []
+    depth = start = 0
+    for index, char in enumerate(line):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth = max(depth - 1, 0)
+        elif char == "," and not depth:
+            values.append(line[start:index].strip())
+            start = index + 1
+    values.append(line[start:].strip())
+    return values
+
+
+def _valid_rule(ptype: object, rule: object) -> bool:
+    """Return whether a parsed line is a policy type and at most six string values."""
+    return (
+        isinstance(ptype, str)
+        and bool(ptype)
+        and isinstance(rule, list)
+        and len(rule) <= RULE_WIDTH
+        and all(isinstance(value, str) for value in rule)
+    )
+
+
+def format_rows(
+    rows: Iterable[Sequence[str | None]],
+    policy_format: PolicyFormat,
+) -> str:
+    """Format ``(ptype, v0..v5)`` rows as policy file lines.
+
+    :param rows: The rows to format.
+    :param policy_format: The format of the lines.
+
+    :raises AdapterError: If a rule cannot be written as a CSV line that reads back as the same rule.
+    """
+    output = io.StringIO()
+    if policy_format == "csv":
+        for row in rows:
+            values = _row_values(row)
+            line = ", ".join(values)
+            if "\n" in line or _split_line(line) != values:
+                msg = f"Rule {values!r} cannot be written as a CSV line, export it as JSONL."
+                raise AdapterError(msg)
+            output.write(line)
+            output.write("\n")
+        return output.getvalue()
+    for ptype, *rule in (_row_values(row) for row in rows):
+        output.write(json.dumps({"ptype": ptype, "rule": rule}, ensure_ascii=False))
+        output.write("\n")
+    return output.getvalue()
+
+
+def _row_values(row: Sequence[str | None]) -> list[Any]:
+    """Return the values of a row up to its first ``None``."""
+    return list(takewhile(lambda value: value is not None, row))
@@ -0,0 +1,250 @@
+"""Database-backed Watcher for the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import inspect
+import logging
+import uuid
+from typing import TYPE_CHECKING, Any
+
+from casbin.persist.watcher import Watcher as CasbinWatcher
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from typing_extensions import Self
+
+from .adapter import AdapterError, _check_attributes
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import TracebackType
+
+    from sqlalchemy import Table
+    from sqlalchemy.ext.asyncio import AsyncConnection
+    from sqlmodel import SQLModel
+
+    from .adapter import Adapter
+
+logger = logging.getLogger(__name__)
+
+REVISION_ROW_ID = 1
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.1
+
+
+class Watcher(CasbinWatcher):
+    """Watcher detecting policy changes made by other nodes through a single revision row.
+
+    Every :meth:`update` bumps the revision row, every node polls it with one primary key lookup per interval
+    and, when another node bumped it, calls the update callback once per burst of updates. On PostgreSQL with
+    asyncpg, a ``LISTEN``/``NOTIFY`` channel can wake the nodes up before the next poll.
+    """
+
+    def __init__(  # noqa: PLR0913,PLR0917
+        self: Self,
+        adapter: Adapter,
+        revision_class: type[SQLModel] | None = None,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        debounce: float = DEFAULT_DEBOUNCE,
+        channel: str | None = None,
+        node_id: str | None = None,
+    ) -> None:
+        """Initialize the Watcher.
+
+        :param adapter: The adapter whose engine is used.
+        :param revision_class: The Database class holding the revision row, if not provided, the default
+            CasbinPolicyRevision class will be used.
+        :param interval: How many seconds to wait between two polls of the revision row.
+        :param debounce: How many seconds to wait for further updates before calling the update callback.
+        :param channel: The PostgreSQL channel to LISTEN and NOTIFY on, requires the asyncpg driver.
+        :param node_id: The identifier of this node, a random one is used if not provided.
+
+        :raises AdapterError: If the revision_class lacks the required attributes or the channel is not supported.
+        """
+        if revision_class is None:
+            from .models import CasbinPolicyRevision  # noqa: PLC0415
+
+            table = CasbinPolicyRevision.__table__  # type: ignore[attr-defined]
+        else:
+            _check_attributes(
+                revision_class,
+                ("id", "revision", "origin"),
+                "RevisionClass",
+            )
+            table = revision_class.__table__  # type: ignore[attr-defined]
+        if channel is not None and adapter.engine.dialect.driver != "asyncpg":
+            msg = "LISTEN/NOTIFY channels require the PostgreSQL asyncpg driver."
+            raise AdapterError(msg)
+
+        self._engine = adapter.engine
+        self._table: Table = table
+        self._interval = interval
+        self._debounce = debounce
+        self._channel = channel
+        self.node_id = node_id or uuid.uuid4().hex
+        self._callback: Callable[[], Any] | None = None
+        self._revision = 0
+        self._own_revisions: set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._pending: set[asyncio.Task[Any]] = set()
+        self._listen_connection: AsyncConnection | None = None
+
+    async def __aenter__(self: Self) -> Self:
+        """Start watching."""
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self: Self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Stop watching."""
+        await self.aclose()
+
+    def set_update_callback(self: Self, func: Callable[[], Any]) -> None:
+        """Set the callback called when another node changed the policy, such as ``enforcer.load_policy``.
+
+        :param func: A function or coroutine function taking no arguments.
+        """
+        self._callback = func
+
+    async def create_table(self: Self) -> None:
+        """Create the revision table and its single row, if they do not exist."""
+        async with self._engine.begin() as conn:
+            await conn.run_sync(self._table.create, checkfirst=True)
+        with contextlib.suppress(IntegrityError):
+            async with self._engine.begin() as conn:
+                if (
+                    await conn.scalar(
+                        select(self._table.c.id).where(
+                            self._table.c.id == REVISION_ROW_ID,
+                        ),
+                    )
+                    is None
+                ):
+                    await conn.execute(
+                        insert(self._table).values(id=REVISION_ROW_ID, revision=0),
+                    )
+
+    async def start(self: Self) -> None:
+        """Create the revision row if needed, remember the current revision and start polling."""
+        await self.create_table()
+        self._revision = await self._read_revision()
+        if self._channel is not None:
+            self._listen_connection = await self._engine.connect()
+            raw_connection = await self._listen_connection.get_raw_connection()
+            await raw_connection.driver_connection.add_listener(self._channel, self._on_notify)  # type: ignore[union-attr]
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def update(self: Self) -> None:
+        """Bump the revision row so other nodes reload, called by the enforcer after every policy change."""
+        task = asyncio.get_running_loop().create_task(self.bump())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def bump(self: Self) -> int:
+        """Bump the revision row and notify the channel, in a single transaction.
+
+        :return: The new revision.
+        """
+        table = self._table
+        async with self._engine.begin() as conn:
+            await conn.execute(
+                update(table)
+                .where(table.c.id == REVISION_ROW_ID)
+                .values(revision=table.c.revision + 1, origin=self.node_id),
+            )
+            result = await conn.execute(
+                select(table.c.revision).where(table.c.id == REVISION_ROW_ID),
+            )
+            revision: int = result.scalar_one()
+            self._own_revisions.add(revision)
+            if self._channel is not None:
+                await conn.execute(select(func.pg_notify(self._channel, self.node_id)))
+        return revision
+
+    def close(self: Self) -> None:
+        """Stop watching, the callback will not be called any more."""
+        task = asyncio.get_running_loop().create_task(self.aclose())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def aclose(self: Self) -> None:
+        """Stop watching and wait for the pending revision bumps."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._listen_connection is not None:
+            raw_connection = await self._listen_connection.get_raw_connection()
+            await raw_connection.driver_connection.remove_listener(self._channel, self._on_notify)  # type: ignore[union-attr]
+            await self._listen_connection.close()
+            self._listen_connection = None
+        pending = [task for task in self._pending if task is not asyncio.current_task()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _on_notify(
+        self: Self,
+        _connection: object,
+        _pid: int,
+        _channel: str,
+        payload: str,
+    ) -> None:
+        """Wake the polling loop up when another node notified the channel."""
+        if payload != self.node_id:
+            self._wakeup.set()
+
+    async def _read_revision(self: Self) -> int:
+        """Read the revision row with a single primary key lookup."""
+        async with self._engine.connect() as conn:
+            revision = await conn.scalar(
+                select(self._table.c.revision).where(
+                    self._table.c.id == REVISION_ROW_ID,
+                ),
+            )
+        return revision or 0
+
+    async def _poll(self: Self) -> bool:
+        """Read the revision row and tell whether another node changed the policy since the last poll."""
+        revision = await self._read_revision()
+        if revision <= self._revision:
+            return False
+        own = sum(
+            1
+            for own_revision in self._own_revisions
+            if self._revision < own_revision <= revision
+        )
+        self._own_revisions = {
+            own_revision
+            for own_revision in self._own_revisions
+            if own_revision > revision
+        }
+        changed = own < revision - self._revision
+        self._revision = revision
+        return changed
+
+    async def _run(self: Self) -> None:
+        """Poll the revision row and call the update callback once per burst of foreign updates."""
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            self._wakeup.clear()
+            try:
+                if not await self._poll():
+                    continue
+                # Let the rest of the burst land so it is covered by a single reload.
+                await asyncio.sleep(self._debounce)
+                await self._poll()
+                self._wakeup.clear()
+                if self._callback is not None:
+                    result = self._callback()
+                    if inspect.isawaitable(result):
+                        await result
+            except Exception:
+                logger.exception("Failed to refresh the policy after a revision change")
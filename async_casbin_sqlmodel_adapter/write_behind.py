@@ -0,0 +1,180 @@
+"""Write-behind queue for the SQLModel-based Casbin adapter."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from typing_extensions import Self
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from .adapter import Adapter, RuleRow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITE_BEHIND_MAX_PENDING = 10_000
+
+PendingOp = Literal["add", "remove"]
+
+
+def _rejects_rows(exc: DBAPIError) -> bool:
+    """Return whether the database rejected the written rows themselves, which retrying would not fix.
+
+    Lost connections, timeouts and lock errors are reported as operational or interface errors instead.
+    """
+    return (
+        not isinstance(exc, (OperationalError, InterfaceError))
+        and not exc.connection_invalidated
+    )
+
+
+class WriteBehindQueue:
+    """Buffer of rule adds and removes written to the storage in bulk transactions, after the caller returned.
+
+    Only the net change of every rule is kept: adding a rule that is pending removal, or the other way around,
+    cancels both. The buffer is flushed in a single transaction every ``interval`` seconds, as soon as it holds
+    ``batch_size`` rules, and by the writer itself when it holds ``max_pending`` rules.
+
+    Durability: a write is only durable once a flush containing it committed. Pending writes are lost if the
+    process dies before :meth:`flush` or :meth:`aclose` returned, while the enforcer's in-memory model already
+    reflects them. A flush that failed because of the database, such as a lost connection, keeps its writes
+    pending for the next flush. When the database rejects the rows themselves, such as a rule violating the
+    unique key, the flush is split to isolate the rejected rules: they are dropped and reported to ``on_error``,
+    the others are written.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        adapter: Adapter,
+        interval: float,
+        batch_size: int,
+        max_pending: int = DEFAULT_WRITE_BEHIND_MAX_PENDING,
+        on_error: Callable[[PendingOp, RuleRow, Exception], object] | None = None,
+    ) -> None:
+        """Initialize an empty queue.
+
+        :param adapter: The adapter whose storage the writes go to.
+        :param interval: How many seconds a write waits at most before being flushed.
+        :param batch_size: How many pending rules trigger a flush.
+        :param max_pending: How many pending rules make writers flush before returning.
+        :param on_error: Called with the write, the rule and the error of every write the database rejected, they
+            are logged if not provided.
+        """
+        self._adapter = adapter
+        self._interval = interval
+        self._batch_size = batch_size
+        self._max_pending = max_pending
+        self._on_error = on_error
+        self._pending: dict[RuleRow, PendingOp] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self: Self) -> int:
+        """Return how many rules are pending."""
+        return len(self._pending)
+
+    async def put(self: Self, op: PendingOp, rows: Iterable[RuleRow]) -> None:
+        """Queue rules to add or remove, waiting for a flush when the queue is full.
+
+        :param op: Whether the rules are added or removed.
+        :param rows: The ``(ptype, v0..v5)`` rows of the rules.
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        for row in rows:
+            if len(self._pending) >= self._max_pending:
+                await self.flush()
+            self._merge(row, op)
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    def _merge(self: Self, row: RuleRow, op: PendingOp) -> None:
+        """Record a write, cancelling the pending opposite write of the same rule."""
+        previous = self._pending.get(row)
+        if previous is None:
+            self._pending[row] = op
+        elif previous != op:
+            del self._pending[row]
+
+    async def flush(self: Self) -> int:
+        """Write every pending rule in a single transaction, or in several when the database rejected some.
+
+        :return: How many rules were written.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            unwritten = dict(pending)
+            try:
+                return await self._write(pending, unwritten)
+            except BaseException:
+                newer, self._pending = self._pending, unwritten
+                for row, op in newer.items():
+                    self._merge(row, op)
+                raise
+
+    async def _write(
+        self: Self,
+        pending: dict[RuleRow, PendingOp],
+        unwritten: dict[RuleRow, PendingOp],
+    ) -> int:
+        """Write rules in a single transaction, splitting it in halves until the rejected rules are isolated.
+
+        :param pending: The rules to write.
+        :param unwritten: The rules of the flush neither written nor dropped yet, updated as they are.
+
+        :return: How many rules were written.
+        """
+        try:
+            await self._adapter._write_pending(pending)  # noqa: SLF001
+        except DBAPIError as exc:
+            if not _rejects_rows(exc):
+                raise
+            if len(pending) == 1:
+                ((row, op),) = pending.items()
+                del unwritten[row]
+                self._report(op, row, exc)
+                return 0
+            items = list(pending.items())
+            half = len(items) // 2
+            return await self._write(dict(items[:half]), unwritten) + await self._write(
+                dict(items[half:]),
+                unwritten,
+            )
+        for row in pending:
+            del unwritten[row]
+        return len(pending)
+
+    def _report(self: Self, op: PendingOp, row: RuleRow, exc: DBAPIError) -> None:
+        """Report a write the database rejected, which was dropped from the queue."""
+        if self._on_error is None:
+            logger.error("Dropped the queued %s of %s", op, row, exc_info=exc)
+        else:
+            self._on_error(op, row, exc)
+
+    async def aclose(self: Self) -> None:
+        """Stop the periodic flushes and flush the pending rules."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self: Self) -> None:
+        """Flush the queue every interval, or as soon as it holds a full batch."""
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush the write-behind queue")
@@ -0,0 +1 @@
+"""Benchmarks for the Async SQLModel Adapter for PyCasbin."""
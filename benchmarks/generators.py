@@ -0,0 +1,118 @@
+"""Synthetic policy sets shaped like real RBAC, RBAC with domains and ABAC deployments."""
+
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+ACTIONS = ("read", "write", "delete", "list")
+
+RBAC_MODEL = """
+[request_definition]
+r = sub, obj, act
+
+[policy_definition]
+p = sub, obj, act
+
+[role_definition]
+g = _, _
+
+[policy_effect]
+e = some(where (p.eft == allow))
+
+[matchers]
+m = g(r.sub, p.sub) && r.obj == p.obj && r.act == p.act
+"""
+
+DOMAINS_MODEL = """
+[request_definition]
+r = sub, dom, obj, act
+
+[policy_definition]
+p = sub, dom, obj, act
+
+[role_definition]
+g = _, _, _
+
+[policy_effect]
+e = some(where (p.eft == allow))
+
+[matchers]
+m = g(r.sub, p.sub, r.dom) && r.dom == p.dom && r.obj == p.obj && r.act == p.act
+"""
+
+ABAC_MODEL = """
+[request_definition]
+r = sub, obj, act
+
+[policy_definition]
+p = sub_rule, obj, act, eft
+
+[policy_effect]
+e = some(where (p.eft == allow)) && !some(where (p.eft == deny))
+
+[matchers]
+m = eval(p.sub_rule) && r.obj == p.obj && r.act == p.act
+"""
+
+
+class Rule(NamedTuple):
+    """A generated rule."""
+
+    ptype: str
+    fields: list[str]
+
+
+class Dataset(NamedTuple):
+    """A kind of policy set, with the model it is enforced with and the rules of a given size."""
+
+    model: str
+    rules: Callable[[int, int], Iterator[Rule]]
+
+
+def rbac_rules(count: int, seed: int = 0) -> Iterator[Rule]:
+    """Yield ``count`` distinct rules: one role assignment per five rules, the rest role permissions.
+
+    A few roles get most of the permissions, as in a typical application.
+    """
+    rng = random.Random(seed)
+    roles = max(1, count // 50)
+    for i in range(count):
+        role = f"role{int(rng.paretovariate(1.2)) % roles}"
+        if i % 5 == 0:
+            yield Rule("g", [f"user{i // 5}", role])
+        else:
+            yield Rule("p", [role, f"/data/{i}", ACTIONS[i % 4]])
+
+
+def domain_rules(count: int, seed: int = 0) -> Iterator[Rule]:
+    """Yield ``count`` distinct rules spread over tenants of very different sizes, one role assignment per five rules."""
+    rng = random.Random(seed)
+    domains = max(1, count // 200)
+    for i in range(count):
+        domain = f"tenant{int(rng.paretovariate(1.1)) % domains}"
+        role = f"role{i % 8}"
+        if i % 5 == 0:
+            yield Rule("g", [f"user{i // 5}", role, domain])
+        else:
+            yield Rule("p", [role, domain, f"/data/{i}", ACTIONS[i % 4]])
+
+
+def abac_rules(count: int, seed: int = 0) -> Iterator[Rule]:
+    """Yield ``count`` distinct permission rules whose subject is an attribute expression, one deny per ten rules."""
+    rng = random.Random(seed)
+    departments = max(1, count // 100)
+    for i in range(count):
+        condition = f"r.sub.dept == 'dept{rng.randrange(departments)}' && r.sub.level >= {i % 5}"
+        effect = "deny" if i % 10 == 0 else "allow"
+        yield Rule("p", [condition, f"/data/{i}", ACTIONS[i % 4], effect])
+
+
+DATASETS = {
+    "rbac": Dataset(RBAC_MODEL, rbac_rules),
+    "domains": Dataset(DOMAINS_MODEL, domain_rules),
+    "abac": Dataset(ABAC_MODEL, abac_rules),
+}
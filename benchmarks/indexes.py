@@ -0,0 +1,115 @@
+"""Benchmark filtered loads on a large SQLite file before and after creating the rule lookup indexes.
+
+Run with ``python -m benchmarks.indexes --rules 200000``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import casbin
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Field, SQLModel
+
+from async_casbin_sqlmodel_adapter import Adapter, Filter
+
+RBAC_MODEL = """
+[request_definition]
+r = sub, obj, act
+
+[policy_definition]
+p = sub, obj, act
+
+[role_definition]
+g = _, _
+
+[policy_effect]
+e = some(where (p.eft == allow))
+
+[matchers]
+m = g(r.sub, p.sub) && r.obj == p.obj && r.act == p.act
+"""
+
+
+class UnindexedRule(SQLModel, table=True):
+    """Rule table without any index besides the primary key."""
+
+    __tablename__ = "casbin_rule_unindexed"
+
+    id: int = Field(primary_key=True)
+    ptype: str = Field(max_length=255)
+    v0: str = Field(max_length=255)
+    v1: str = Field(max_length=255)
+    v2: str | None = Field(max_length=255, default=None)
+    v3: str | None = Field(max_length=255, default=None)
+    v4: str | None = Field(max_length=255, default=None)
+    v5: str | None = Field(max_length=255, default=None)
+
+
+async def time_filtered_loads(adapter: Adapter, users: list[str]) -> float:
+    """Return the mean wall time of a filtered load per user."""
+    model = casbin.Enforcer.new_model(text=RBAC_MODEL)
+    started = time.perf_counter()
+    for user in users:
+        model.clear_policy()
+        filter_ = Filter()
+        filter_.ptype = ["p"]
+        filter_.v0 = [user]
+        await adapter.load_filtered_policy(model, filter_)
+    return (time.perf_counter() - started) / len(users)
+
+
+async def main(rules: int, queries: int, path: Path) -> dict[str, float | int]:
+    """Fill a SQLite file with ``rules`` rules and time filtered loads without and with indexes."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    table = UnindexedRule.__table__  # type: ignore[attr-defined]
+    async with engine.begin() as conn:
+        await conn.run_sync(table.drop, checkfirst=True)
+        await conn.run_sync(table.create)
+
+    adapter = Adapter(engine, UnindexedRule, write_batch_size=5000)
+    users = rules // 10
+    await adapter.add_policies(
+        "p",
+        "p",
+        ((f"user{i % users}", f"data{i}", "read") for i in range(rules)),
+    )
+    sample = [f"user{random.randrange(users)}" for _ in range(queries)]  # noqa: S311
+
+    without_indexes = await time_filtered_loads(adapter, sample)
+    await adapter.ensure_indexes()
+    with_indexes = await time_filtered_loads(adapter, sample)
+    await engine.dispose()
+
+    return {
+        "rules": rules,
+        "queries": queries,
+        "without_indexes_ms": round(without_indexes * 1000, 3),
+        "with_indexes_ms": round(with_indexes * 1000, 3),
+        "speedup": round(without_indexes / with_indexes, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument(
+        "--path",
+        type=Path,
+        default=None,
+        help="SQLite file, a temporary one by default.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(
+            main(args.rules, args.queries, args.path or Path(tmp) / "bench.db"),
+        )
+    print(json.dumps(result))  # noqa: T201
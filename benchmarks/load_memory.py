@@ -0,0 +1,121 @@
+"""Benchmark the memory a loaded policy keeps, with and without interning the repeated rule values.
+
+Run with ``python -m benchmarks.load_memory --rules 1000000``. Every load is measured with ``tracemalloc``: the
+memory the model retains once loaded, the peak reached while loading and the wall time, slowed down by tracing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import casbin
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from async_casbin_sqlmodel_adapter import Adapter
+
+from .generators import DATASETS
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from casbin import Model
+
+
+class _Uninterned(dict):  # type: ignore[type-arg]
+    """A value dictionary that remembers nothing, so every column of every row keeps its own string."""
+
+    def setdefault(  # type: ignore[override] # noqa: PLR6301
+        self: _Uninterned,
+        _key: str,
+        default: str,
+    ) -> str:
+        return default
+
+
+class UninternedAdapter(Adapter):
+    """The adapter loading rules without interning their values, as a baseline."""
+
+    @staticmethod
+    def _load_policy_rows(
+        rows: Iterable[Sequence[str | None]],
+        model: Model,
+        strings: dict[str, str] | None = None,  # noqa: ARG004
+    ) -> None:
+        Adapter._load_policy_rows(rows, model, _Uninterned())  # noqa: SLF001
+
+
+async def measure_load(adapter: Adapter, model_text: str) -> dict[str, Any]:
+    """Load the policy into a new model and return the memory it retains and the peak memory of the load."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    model = casbin.Enforcer.new_model(text=model_text)
+    started = time.perf_counter()
+    await adapter.load_policy(model)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del model
+    return {
+        "seconds": round(seconds, 3),
+        "retained_bytes": retained - baseline,
+        "peak_bytes": peak - baseline,
+    }
+
+
+async def main(dataset: str, rules: int, path: Path) -> dict[str, Any]:
+    """Store ``rules`` rules of a dataset in a SQLite file and measure a load with and without interning."""
+    model_text = DATASETS[dataset].model
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    adapter = Adapter(engine, warning=False, write_batch_size=5000)
+    await adapter.create_table()
+    model = casbin.Enforcer.new_model(text=model_text)
+    for rule in DATASETS[dataset].rules(rules, 0):
+        model.model[rule.ptype[0]][rule.ptype].policy.append(rule.fields)
+    await adapter.save_policy(model)
+    del model
+
+    uninterned = await measure_load(
+        UninternedAdapter(engine, warning=False),
+        model_text,
+    )
+    interned = await measure_load(adapter, model_text)
+    await engine.dispose()
+    return {
+        "dataset": dataset,
+        "rules": rules,
+        "uninterned": uninterned,
+        "interned": interned,
+        "retained_reduction": round(
+            1 - interned["retained_bytes"] / uninterned["retained_bytes"],
+            3,
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="rbac")
+    parser.add_argument("--rules", type=int, default=1_000_000)
+    parser.add_argument(
+        "--path",
+        type=Path,
+        default=None,
+        help="SQLite file, a temporary one by default.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(
+            main(args.dataset, args.rules, args.path or Path(tmp) / "bench.db"),
+        )
+    print(json.dumps(result, indent=2))  # noqa: T201
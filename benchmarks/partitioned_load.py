@@ -0,0 +1,91 @@
+"""Benchmark ``load_policy`` on a large SQLite file with the table split into concurrently fetched partitions.
+
+Run with ``python -m benchmarks.partitioned_load --rules 500000 --partitions 1 2 4 8``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import casbin
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from async_casbin_sqlmodel_adapter import Adapter
+
+from .indexes import RBAC_MODEL
+
+
+async def time_load(adapter: Adapter, repeat: int) -> float:
+    """Return the best wall time of ``repeat`` full loads."""
+    best = float("inf")
+    for _ in range(repeat):
+        model = casbin.Enforcer.new_model(text=RBAC_MODEL)
+        started = time.perf_counter()
+        await adapter.load_policy(model)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main(
+    rules: int,
+    partitions: list[int],
+    repeat: int,
+    path: Path,
+) -> dict[str, object]:
+    """Fill a SQLite file with ``rules`` rules and time full loads for every partition count."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    adapter = Adapter(engine, warning=False, write_batch_size=5000)
+    await adapter.create_table()
+    await adapter.bulk_save_policy(casbin.Enforcer.new_model(text=RBAC_MODEL))
+    await adapter.add_policies(
+        "p",
+        "p",
+        ((f"user{i % 1000}", f"data{i}", "read") for i in range(rules)),
+    )
+
+    timings = {}
+    for count in partitions:
+        partitioned = Adapter(engine, warning=False, load_partitions=count)
+        timings[count] = await time_load(partitioned, repeat)
+    await engine.dispose()
+
+    baseline = timings[partitions[0]]
+    return {
+        "rules": rules,
+        "load_ms": {
+            count: round(seconds * 1000, 1) for count, seconds in timings.items()
+        },
+        "speedup": {
+            count: round(baseline / seconds, 2) for count, seconds in timings.items()
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=500_000)
+    parser.add_argument("--partitions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--path",
+        type=Path,
+        default=None,
+        help="SQLite file, a temporary one by default.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(
+            main(
+                args.rules,
+                args.partitions,
+                args.repeat,
+                args.path or Path(tmp) / "bench.db",
+            ),
+        )
+    print(json.dumps(result))  # noqa: T201
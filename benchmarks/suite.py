@@ -0,0 +1,268 @@
+"""Benchmark every adapter operation on synthetic policy sets stored in a SQLite file.
+
+Run with ``python -m benchmarks.suite --sizes 1000 10000 100000 1000000 --output results.json`` and compare the
+JSON output between releases. Every operation reports its wall time, rows read or written per second, the peak
+Python memory it allocated and how many SQL statements it executed. Peak memory is traced with ``tracemalloc``,
+which slows everything down, pass ``--no-memory`` for the most accurate timings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib.metadata import version
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import casbin
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from async_casbin_sqlmodel_adapter import Adapter, Filter, __version__
+
+from .generators import DATASETS, Rule
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from casbin import Model
+
+# How many filtered loads are timed, and which column holds the value they filter on, per dataset.
+FILTERED_LOADS = 20
+FILTER_FIELDS = {"rbac": 0, "domains": 1, "abac": 2}
+
+
+class Recorder:
+    """Time operations and count the statements and memory they use."""
+
+    def __init__(self: Recorder, *, trace_memory: bool) -> None:
+        """Initialize an empty recorder."""
+        self.trace_memory = trace_memory
+        self.statements = 0
+        self.results: list[dict[str, Any]] = []
+
+    def count_statement(self: Recorder, *_args: object) -> None:
+        """Count a statement, an executemany batch counting as one."""
+        self.statements += 1
+
+    async def measure(
+        self: Recorder,
+        labels: dict[str, Any],
+        operation: str,
+        run: Callable[[], Awaitable[int]],
+    ) -> None:
+        """Run an operation returning how many rows it read or wrote and record its metrics."""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        statements = self.statements
+        started = time.perf_counter()
+        rows = await run()
+        seconds = time.perf_counter() - started
+        self.results.append(
+            {
+                **labels,
+                "operation": operation,
+                "seconds": round(seconds, 6),
+                "rows": rows,
+                "rows_per_second": round(rows / seconds) if seconds else None,
+                "peak_memory_bytes": (
+                    tracemalloc.get_traced_memory()[1] - baseline
+                    if self.trace_memory
+                    else None
+                ),
+                "statements": self.statements - statements,
+            },
+        )
+
+
+def fill_model(model: Model, rules: list[Rule]) -> None:
+    """Append rules to the model's assertions."""
+    for rule in rules:
+        model.model[rule.ptype[0]][rule.ptype].policy.append(rule.fields)
+
+
+def count_rules(model: Model) -> int:
+    """Count the rules loaded into a model."""
+    return sum(
+        len(assertion.policy)
+        for sec in ("p", "g")
+        for assertion in model.model.get(sec, {}).values()
+    )
+
+
+async def run_dataset(
+    recorder: Recorder,
+    name: str,
+    size: int,
+    path: Path,
+    *,
+    seed: int,
+) -> None:
+    """Time every operation on ``size`` rules of a dataset, in a fresh SQLite file."""
+    dataset = DATASETS[name]
+    path.unlink(missing_ok=True)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    event.listen(engine.sync_engine, "before_cursor_execute", recorder.count_statement)
+    adapter = Adapter(engine, warning=False)
+    await adapter.create_table()
+
+    rules = list(dataset.rules(size, seed))
+    policies = [rule for rule in rules if rule.ptype == "p"]
+    # Rules the single-rule-type operations work on: new ones and the ones sharing the first rule's filter value.
+    changed = [
+        [*rule.fields[:-1], f"{rule.fields[-1]}-new"]
+        for rule in policies[: max(1, size // 10)]
+    ]
+    field = FILTER_FIELDS[name]
+    value = policies[0].fields[field]
+    matching = [rule.fields for rule in policies if rule.fields[field] == value]
+    labels = {"dataset": name, "rules": size}
+
+    model = casbin.Enforcer.new_model(text=dataset.model)
+    fill_model(model, rules)
+    await recorder.measure(labels, "save_policy", lambda: _save(adapter, model, size))
+
+    async def load() -> int:
+        model = casbin.Enforcer.new_model(text=dataset.model)
+        await adapter.load_policy(model)
+        return count_rules(model)
+
+    async def filtered_load() -> int:
+        model = casbin.Enforcer.new_model(text=dataset.model)
+        loaded = 0
+        for _ in range(FILTERED_LOADS):
+            model.clear_policy()
+            await adapter.load_filtered_policy(
+                model,
+                Filter(ptype=["p"], **{f"v{field}": [value]}),
+            )
+            loaded += count_rules(model)
+        return loaded
+
+    async def update_filtered() -> int:
+        new_rules = [[*rule[:-1], f"{rule[-1]}-updated"] for rule in matching]
+        old_rules = await adapter.update_filtered_policies(
+            "p",
+            "p",
+            new_rules,
+            field,
+            value,
+        )
+        return len(old_rules) + len(new_rules)
+
+    async def remove_filtered() -> int:
+        await adapter.remove_filtered_policy("p", "p", field, value)
+        return len(matching)
+
+    await recorder.measure(labels, "load_policy", load)
+    await recorder.measure(labels, "load_filtered_policy", filtered_load)
+    await recorder.measure(
+        labels,
+        "add_policies",
+        lambda: adapter.add_policies("p", "p", changed),
+    )
+    await recorder.measure(
+        labels,
+        "remove_policies",
+        lambda: adapter.remove_policies("p", "p", changed),
+    )
+    await recorder.measure(labels, "update_filtered_policies", update_filtered)
+    await recorder.measure(labels, "remove_filtered_policy", remove_filtered)
+    await engine.dispose()
+
+
+async def _save(adapter: Adapter, model: Model, size: int) -> int:
+    """Save a model and return how many rules it holds."""
+    await adapter.save_policy(model)
+    return size
+
+
+async def main(
+    datasets: list[str],
+    sizes: list[int],
+    directory: Path,
+    *,
+    trace_memory: bool,
+    seed: int,
+) -> dict[str, Any]:
+    """Run every dataset at every size and return the metadata and metrics."""
+    recorder = Recorder(trace_memory=trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    for name in datasets:
+        for size in sizes:
+            await run_dataset(
+                recorder,
+                name,
+                size,
+                directory / f"{name}-{size}.db",
+                seed=seed,
+            )
+    if trace_memory:
+        tracemalloc.stop()
+    return {
+        "meta": {
+            "adapter": __version__,
+            "python": platform.python_version(),
+            "sqlalchemy": version("sqlalchemy"),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": sys.platform,
+            "seed": seed,
+            "trace_memory": trace_memory,
+        },
+        "results": recorder.results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--datasets",
+        nargs="+",
+        choices=sorted(DATASETS),
+        default=sorted(DATASETS),
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Do not trace peak memory.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file, stdout by default.",
+    )
+    parser.add_argument(
+        "--directory",
+        type=Path,
+        default=None,
+        help="Where the SQLite files are created, a temporary directory by default.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = asyncio.run(
+            main(
+                args.datasets,
+                args.sizes,
+                args.directory or Path(tmp),
+                trace_memory=not args.no_memory,
+                seed=args.seed,
+            ),
+        )
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)  # noqa: T201
+    else:
+        args.output.write_text(output + "\n")
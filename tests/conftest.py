@@ -4,6 +4,7 @@ from pathlib import Path
 
 import casbin
 import pytest
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import Field, SQLModel, delete
@@ -17,6 +18,18 @@ def engine_fixture() -> AsyncEngine:
     return create_async_engine("sqlite+aiosqlite:///")
 
 
+@pytest.fixture(name="statements")
+def statements_fixture(engine: AsyncEngine) -> list[str]:
+    statements: list[str] = []
+
+    def before_cursor_execute(*args: object) -> None:
+        statements.append(str(args[2]))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest.fixture(name="session")
 async def session_fixture(engine: AsyncEngine) -> AsyncSession:
     async with engine.begin() as conn:
@@ -34,6 +47,12 @@ def rbac_model_conf_fixture() -> str:
     return str(dir_path / "rbac_model.conf")
 
 
+@pytest.fixture(name="rbac_with_domains_model_conf")
+def rbac_with_domains_model_conf_fixture() -> str:
+    dir_path = Path(__file__).resolve().parent
+    return str(dir_path / "rbac_with_domains_model.conf")
+
+
 @pytest.fixture(name="enforcer")
 async def enforcer_fixture(
     engine: AsyncEngine,
@@ -59,8 +78,8 @@ async def enforcer_fixture(
     return enforcer
 
 
-@pytest.fixture(name="CustomRule")
-async def CustomRule_fixture() -> type[SQLModel]:  # noqa: N802
+@pytest.fixture(name="CustomRule", scope="session")
+def CustomRule_fixture() -> type[SQLModel]:  # noqa: N802
     class CustomRule(SQLModel, table=True):
         __tablename__ = "casbin_rule2"
 
@@ -77,8 +96,8 @@ async def CustomRule_fixture() -> type[SQLModel]:  # noqa: N802
     return CustomRule
 
 
-@pytest.fixture(name="CustomRuleBroken")
-async def CustomRuleBroken_fixture() -> type[SQLModel]:  # noqa: N802
+@pytest.fixture(name="CustomRuleBroken", scope="session")
+def CustomRuleBroken_fixture() -> type[SQLModel]:  # noqa: N802
     class CustomRuleBroken(SQLModel, table=True):
         __tablename__ = "casbin_rule3"
 
@@ -1,17 +1,34 @@
 from __future__ import annotations
 
+import asyncio
 import re
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import pytest
 from casbin import AsyncEnforcer
+from sqlalchemy import create_mock_engine, delete
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import SQLModel, select
 
-from async_casbin_sqlmodel_adapter import Adapter, AdapterError, Filter
-from async_casbin_sqlmodel_adapter.models import CasbinRule
+from async_casbin_sqlmodel_adapter import (
+    Adapter,
+    AdapterError,
+    Filter,
+    Match,
+    PolicyChanges,
+)
+from async_casbin_sqlmodel_adapter.models import (
+    CasbinChangelogHead,
+    CasbinRule,
+    CasbinRuleChange,
+)
 
 if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Sequence
+    from pathlib import Path
+
     from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+    from sqlalchemy.sql.ddl import ExecutableDDLElement
 
 
 async def test_custom_db_class(
@@ -365,3 +382,726 @@ async def test_is_filtered(
     enforcer1 = AsyncEnforcer(rbac_model_conf, adapter1)
     await enforcer1.load_policy()
     assert enforcer1.is_filtered()
+
+
+async def test_load_policy_streams_in_chunks(
+    engine: AsyncEngine,
+    session: AsyncSession,
+    rbac_model_conf: str,
+) -> None:
+    rules = [
+        CasbinRule(ptype="p", v0=f"user{i}", v1="data, with comma", v2="read")
+        for i in range(25)
+    ]
+    session.add_all([*rules, CasbinRule(ptype="x", v0="unknown", v1="ptype")])
+    await session.commit()
+
+    adapter = Adapter(engine, load_chunk_size=4)
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+
+    policy = enforcer.get_policy()
+    assert len(policy) == len(rules)
+    assert ["user0", "data, with comma", "read"] in policy
+    assert enforcer.enforce("user24", "data, with comma", "read")
+    # Repeated values are interned across chunks.
+    assert len({id(rule[1]) for rule in policy}) == 1
+    assert len({id(rule[2]) for rule in policy}) == 1
+
+    with pytest.raises(AdapterError):
+        Adapter(engine, load_chunk_size=0)
+
+
+@pytest.mark.parametrize("partition_by", ["id", "ptype"])
+async def test_load_policy_in_partitions(
+    engine: AsyncEngine,
+    enforcer: AsyncEnforcer,
+    rbac_model_conf: str,
+    partition_by: str,
+) -> None:
+    await enforcer.add_policies([[f"user{i}", f"data{i}", "read"] for i in range(20)])
+    adapter = Adapter(
+        engine,
+        load_partitions=3,
+        partition_by=partition_by,
+        load_concurrency=2,
+    )
+    partitioned = AsyncEnforcer(rbac_model_conf, adapter)
+    await partitioned.load_policy()
+    assert partitioned.get_policy() == enforcer.get_policy()
+    assert partitioned.get_grouping_policy() == enforcer.get_grouping_policy()
+
+    with pytest.raises(AdapterError):
+        Adapter(engine, load_partitions=0)
+    with pytest.raises(AdapterError):
+        Adapter(engine, load_partitions=2, load_concurrency=0)
+    with pytest.raises(AdapterError):
+        Adapter(engine, partition_by="v0")
+
+
+async def test_partitions_are_streamed(
+    engine: AsyncEngine,
+    enforcer: AsyncEnforcer,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    await enforcer.add_policies([[f"user{i}", f"data{i}", "read"] for i in range(40)])
+    monkeypatch.setattr("async_casbin_sqlmodel_adapter.adapter.PARTITION_PREFETCH", 1)
+    adapter = Adapter(
+        engine,
+        load_chunk_size=2,
+        load_partitions=4,
+        load_concurrency=2,
+    )
+    fetched = 0
+    stream_rules = adapter._stream_rules  # noqa: SLF001
+
+    async def count_chunks(*args: object) -> AsyncIterator[Sequence[Any]]:
+        nonlocal fetched
+        async for rows in stream_rules(*args):
+            fetched += 1
+            yield rows
+
+    monkeypatch.setattr(adapter, "_stream_rules", count_chunks)
+    chunks: list[Sequence[Any]] = []
+    ahead = 0
+    async for rows in adapter._iter_policy_rows():  # noqa: SLF001
+        chunks.append(rows)
+        ahead = max(ahead, fetched - len(chunks))
+    # Every running partition holds a queued chunk and the one waiting to be queued.
+    assert ahead <= 2 * 2
+    expected = [
+        row
+        async for rows in Adapter(engine)._iter_policy_rows()  # noqa: SLF001
+        for row in rows
+    ]
+    assert [row for rows in chunks for row in rows] == expected
+
+
+async def test_load_filtered_policy_streams_in_chunks(enforcer: AsyncEnforcer) -> None:
+    enforcer.get_adapter()._load_chunk_size = 1  # noqa: SLF001
+    _filter = Filter()
+    _filter.ptype = ["p"]
+    _filter.v0 = ["data2_admin"]
+    await enforcer.load_filtered_policy(_filter)
+    assert enforcer.get_policy() == [
+        ["data2_admin", "data2", "read"],
+        ["data2_admin", "data2", "write"],
+    ]
+    assert enforcer.get_grouping_policy() == []
+    assert enforcer.is_filtered()
+
+
+def test_filter_fields_are_per_instance() -> None:
+    first = Filter()
+    second = Filter(v0=["bob"])
+    first.ptype.append("p")
+    assert second.ptype == []
+    assert first.v0 == []
+
+
+@pytest.mark.parametrize(
+    ("filter_", "expected"),
+    [
+        (
+            Filter(ptype=["p"], v0=Match.prefix("data2_")),
+            [["data2_admin", "data2", "read"], ["data2_admin", "data2", "write"]],
+        ),
+        (
+            Filter(ptype=["p"], v0=Match.like("%o%")),
+            [["bob", "data2", "write"]],
+        ),
+        (
+            Filter(ptype=["p"], v0=Match.not_in("alice", "data2_admin")),
+            [["bob", "data2", "write"]],
+        ),
+        (
+            Filter(v0=Match.in_("alice") | Match.prefix("b"), v2=Match.is_not_null()),
+            [["alice", "data1", "read"], ["bob", "data2", "write"]],
+        ),
+        (
+            Filter(v1=Match.prefix("data") & Match.not_in("data1"), v2=["read"]),
+            [["data2_admin", "data2", "read"]],
+        ),
+    ],
+)
+async def test_load_filtered_policy_matches(
+    enforcer: AsyncEnforcer,
+    filter_: Filter,
+    expected: list[list[str]],
+) -> None:
+    await enforcer.load_filtered_policy(filter_)
+    assert enforcer.get_policy() == expected
+
+
+async def test_filter_null_and_escaped_prefix(enforcer: AsyncEnforcer) -> None:
+    await enforcer.get_adapter().add_policies(
+        "p",
+        "p",
+        [("a%b", "data1", "read"), ("axb", "data1", "read")],
+    )
+    await enforcer.load_filtered_policy(Filter(v0=Match.prefix("a%")))
+    assert enforcer.get_policy() == [["a%b", "data1", "read"]]
+
+    await enforcer.load_filtered_policy(Filter(v2=Match.is_null()))
+    assert enforcer.get_policy() == []
+    assert enforcer.get_grouping_policy() == [["alice", "data2_admin"]]
+
+
+async def test_filtered_statement_is_cached(enforcer: AsyncEnforcer) -> None:
+    adapter = enforcer.get_adapter()
+    await enforcer.load_filtered_policy(Filter(ptype=["p"], v0=["alice"]))
+    await enforcer.load_filtered_policy(Filter(ptype=["p"], v0=["bob", "alice"]))
+    assert len(adapter._filter_statements) == 1  # noqa: SLF001
+    assert enforcer.get_policy() == [
+        ["alice", "data1", "read"],
+        ["bob", "data2", "write"],
+    ]
+
+    await enforcer.load_filtered_policy(Filter(ptype=["p"], v0=Match.prefix("a")))
+    expected_shapes = 2
+    assert len(adapter._filter_statements) == expected_shapes  # noqa: SLF001
+
+
+async def test_query_policies_pages(
+    enforcer: AsyncEnforcer,
+    statements: list[str],
+) -> None:
+    adapter = enforcer.get_adapter()
+    page = await adapter.query_policies(Filter(ptype=["p"]), limit=3)
+    assert page.rows == [
+        ("p", "alice", "data1", "read", None, None, None),
+        ("p", "bob", "data2", "write", None, None, None),
+        ("p", "data2_admin", "data2", "read", None, None, None),
+    ]
+    assert page.next_after is not None
+    statements.clear()
+    last = await adapter.query_policies(
+        Filter(ptype=["p"]),
+        after=page.next_after,
+        limit=3,
+    )
+    assert last.rows == [("p", "data2_admin", "data2", "write", None, None, None)]
+    assert last.next_after is None
+    assert len(statements) == 1
+    assert "LIMIT" in statements[0]
+    assert "count" not in statements[0].lower()
+
+    page = await adapter.query_policies(Filter(v0=Match.prefix("data2_")), limit=2)
+    assert [row[3] for row in page.rows] == ["read", "write"]
+    assert page.next_after is None
+    with pytest.raises(AdapterError):
+        await adapter.query_policies(limit=0)
+
+
+async def test_count_and_exists(enforcer: AsyncEnforcer) -> None:
+    adapter = enforcer.get_adapter()
+    expected_rules, expected_data2_rules = 5, 3
+    assert await adapter.count_policies() == expected_rules
+    assert (
+        await adapter.count_policies(Filter(ptype=["p"], v1=["data2"]))
+        == expected_data2_rules
+    )
+    assert await adapter.count_policies(Filter(v0=["nobody"])) == 0
+
+    assert await adapter.policy_exists(Filter.exact("p", ["alice", "data1", "read"]))
+    assert await adapter.policy_exists(Filter.exact("g", ["alice", "data2_admin"]))
+    assert not await adapter.policy_exists(Filter.exact("p", ["alice", "data1"]))
+    assert not await adapter.policy_exists(
+        Filter.exact("p", ["alice", "data2", "read"]),
+    )
+    assert await adapter.policy_exists(Filter(v0=Match.prefix("data2")))
+
+
+async def test_update_filtered_policies_in_storage(enforcer: AsyncEnforcer) -> None:
+    assert await enforcer.update_filtered_policies(
+        [["data2_admin", "data3", "read"], ["data2_admin", "data3", "write"]],
+        0,
+        "data2_admin",
+        "data2",
+    )
+    await enforcer.load_policy()
+    assert enforcer.get_policy() == [
+        ["alice", "data1", "read"],
+        ["bob", "data2", "write"],
+        ["data2_admin", "data3", "read"],
+        ["data2_admin", "data3", "write"],
+    ]
+    old_rules = await enforcer.get_adapter().update_filtered_policies(
+        "p",
+        "p",
+        [["bob", "data2", "read"]],
+        0,
+        "bob",
+    )
+    assert old_rules == [["bob", "data2", "write"]]
+    # Values past v5 cannot match, nothing is replaced rather than matching more rules.
+    assert (
+        await enforcer.get_adapter().update_filtered_policies(
+            "p",
+            "p",
+            [["alice", "data9", "read"]],
+            4,
+            "",
+            "",
+            "unknown",
+        )
+        == []
+    )
+    await enforcer.load_policy()
+    assert ["alice", "data1", "read"] in enforcer.get_policy()
+    assert ["alice", "data9", "read"] not in enforcer.get_policy()
+
+
+async def test_batch_merges_writes_in_one_transaction(
+    enforcer: AsyncEnforcer,
+    session: AsyncSession,
+    statements: list[str],
+) -> None:
+    adapter = enforcer.get_adapter()
+    async with adapter.batch():
+        for i in range(50):
+            assert await enforcer.add_policy(f"user{i}", "data1", "read")
+        assert await enforcer.remove_policy("alice", "data1", "read")
+        assert await enforcer.remove_policy("bob", "data2", "write")
+        assert await enforcer.update_policy(
+            ["user0", "data1", "read"],
+            ["user0", "data1", "write"],
+        )
+        assert statements == []
+
+    # One INSERT for the 50 rules, one DELETE for the 2 rules and one UPDATE.
+    expected_statements = 3
+    assert len(statements) == expected_statements
+    assert statements[0].startswith("INSERT")
+    assert statements[1].startswith("DELETE")
+    assert statements[2].startswith("UPDATE")
+
+    rows = (await session.execute(select(CasbinRule.v0, CasbinRule.v2))).all()
+    assert ("user0", "write") in rows
+    assert ("alice", "read") not in rows
+    assert len(rows) == len(enforcer.get_policy()) + len(
+        enforcer.get_grouping_policy(),
+    )
+
+
+async def test_batch_rolls_back_on_error(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    adapter = Adapter(engine)
+    await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+
+    async def failing_batch() -> None:
+        async with adapter.batch():
+            await adapter.add_policy("p", "p", ["bob", "data2", "write"])
+            async with adapter.batch():
+                await adapter.remove_filtered_policy("p", "p", 0, "alice")
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        await failing_batch()
+
+    rows = (await session.execute(select(CasbinRule.v0))).scalars().all()
+    assert rows == ["alice"]
+
+
+async def test_batch_is_owned_by_its_task(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    adapter = Adapter(engine)
+    other = Adapter(engine)
+
+    async def gathering_batch() -> None:
+        async with adapter.batch():
+            await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+            # Another adapter writes outside the batch.
+            assert await other.add_policy("p", "p", ["bob", "data2", "write"])
+            # Tasks started in the batch may read, but not write through its session.
+            assert await asyncio.gather(
+                adapter.count_policies(),
+                adapter.count_policies(),
+            ) == [1, 1]
+            await asyncio.gather(
+                adapter.add_policy("p", "p", ["eve", "data3", "read"]),
+                adapter.add_policy("p", "p", ["eve", "data4", "read"]),
+            )
+
+    with pytest.raises(AdapterError):
+        await gathering_batch()
+
+    rows = (await session.execute(select(CasbinRule.v0))).scalars().all()
+    assert rows == ["bob"]
+
+
+@pytest.mark.parametrize("method", ["auto", "executemany", "values"])
+async def test_add_policies_bulk_insert(
+    engine: AsyncEngine,
+    session: AsyncSession,
+    rbac_model_conf: str,
+    method: str,
+) -> None:
+    adapter = Adapter(engine, write_batch_size=7, bulk_insert_method=method)
+    rules = [(f"user{i}", f"data{i}", "read") for i in range(300)]
+    assert await adapter.add_policies("p", "p", rules) == len(rules)
+
+    rows = (await session.execute(select(CasbinRule))).scalars().all()
+    assert len(rows) == len(rules)
+    assert rows[0].v2 == "read"
+    assert rows[0].v3 is None
+
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+    assert enforcer.enforce("user299", "data299", "read")
+
+
+async def test_bulk_save_policy(enforcer: AsyncEnforcer, session: AsyncSession) -> None:
+    model = enforcer.get_model()
+    model.clear_policy()
+    for i in range(50):
+        model.add_policy("p", "p", [f"user{i}", "data", "read"])
+    model.add_policy("g", "g", ["alice", "admin"])
+
+    adapter = enforcer.get_adapter()
+    rules_count = len(model.get_policy("p", "p")) + len(model.get_policy("g", "g"))
+    assert await adapter.bulk_save_policy(model) == rules_count
+    assert await adapter.save_policy(model) is True
+
+    rows = (await session.execute(select(CasbinRule))).scalars().all()
+    assert len(rows) == rules_count
+    assert {str(row) for row in rows} >= {"p, user0, data, read", "g, alice, admin"}
+
+
+def test_bulk_insert_method_validation(engine: AsyncEngine) -> None:
+    with pytest.raises(AdapterError):
+        Adapter(engine, bulk_insert_method="copy")
+    with pytest.raises(AdapterError):
+        Adapter(engine, bulk_insert_method="unknown")
+    with pytest.raises(AdapterError):
+        Adapter(engine, write_batch_size=0)
+
+
+async def test_remove_policies_single_statement(
+    enforcer: AsyncEnforcer,
+    session: AsyncSession,
+    statements: list[str],
+) -> None:
+    rules = [[f"user{i}", f"data{i}", "read"] for i in range(100)]
+    await enforcer.add_policies(rules)
+
+    statements.clear()
+    assert await enforcer.remove_policies([*rules, ["alice", "data1", "read"]])
+    assert len(statements) == 1
+    assert statements[0].startswith("DELETE")
+
+    rows = (await session.execute(select(CasbinRule))).scalars().all()
+    assert {str(row) for row in rows} == {
+        "p, bob, data2, write",
+        "p, data2_admin, data2, read",
+        "p, data2_admin, data2, write",
+        "g, alice, data2_admin",
+    }
+    assert not enforcer.enforce("alice", "data1", "read")
+
+
+async def test_remove_policies_chunks_and_widths(
+    enforcer: AsyncEnforcer,
+    statements: list[str],
+) -> None:
+    adapter = enforcer.get_adapter()
+    adapter._write_batch_size = 2  # noqa: SLF001
+    await adapter.add_policies("p", "p", [("data2_admin", "data2")])
+    statements.clear()
+    three_values = [
+        ("alice", "data1", "read"),
+        ("bob", "data2", "write"),
+        ("data2_admin", "data2", "read"),
+    ]
+    two_values = [("data2_admin", "data2")]
+    removed = await adapter.remove_policies("p", "p", [*three_values, *two_values])
+    assert removed == len(three_values) + len(two_values)
+    # Two chunks of three-value rules and one chunk of two-value rules.
+    expected_statements = 3
+    assert len(statements) == expected_statements
+
+
+async def test_update_policies_single_statement(
+    enforcer: AsyncEnforcer,
+    session: AsyncSession,
+    statements: list[str],
+) -> None:
+    statements.clear()
+    await enforcer.update_policies(
+        [["alice", "data1", "read"], ["bob", "data2", "write"]],
+        [["alice", "data9", "read"], ["bob", "data9", "write"]],
+    )
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE")
+
+    rows = (
+        (await session.execute(select(CasbinRule).where(CasbinRule.v1 == "data9")))
+        .scalars()
+        .all()
+    )
+    assert {str(row) for row in rows} == {
+        "p, alice, data9, read",
+        "p, bob, data9, write",
+    }
+    assert enforcer.enforce("bob", "data9", "write")
+
+    with pytest.raises(AdapterError):
+        await enforcer.get_adapter().update_policies("p", "p", [["alice"]], [])
+
+
+async def test_writes_match_whole_rules(
+    enforcer: AsyncEnforcer,
+    session: AsyncSession,
+) -> None:
+    adapter = enforcer.get_adapter()
+    await adapter.add_policies(
+        "g",
+        "g",
+        [["bob", "admin"], ["bob", "admin", "tenant1"], ["bob", "admin", "tenant2"]],
+    )
+    await adapter.update_policy("g", "g", ["bob", "admin"], ["bob", "root"])
+    await adapter.remove_policy("g", "g", ["bob", "admin", "tenant1"])
+    assert not await adapter.remove_policy("g", "g", ["bob"])
+
+    rows = (
+        (await session.execute(select(CasbinRule).where(CasbinRule.ptype == "g")))
+        .scalars()
+        .all()
+    )
+    assert sorted(str(row) for row in rows) == [
+        "g, alice, data2_admin",
+        "g, bob, admin, tenant2",
+        "g, bob, root",
+    ]
+
+
+async def test_incremental_save_policy(
+    engine: AsyncEngine,
+    enforcer: AsyncEnforcer,
+    session: AsyncSession,
+    statements: list[str],
+) -> None:
+    # A table created without the unique rule key may hold duplicates, which the save removes.
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DROP INDEX uq_casbin_rule_rule")
+    session.add(CasbinRule(ptype="p", v0="bob", v1="data2", v2="write"))
+    await session.commit()
+
+    model = enforcer.get_model()
+    model.remove_policy("p", "p", ["alice", "data1", "read"])
+    model.add_policy("p", "p", ["eve", "data3", "read"])
+
+    adapter = Adapter(engine, incremental_save=True)
+    statements.clear()
+    assert await adapter.save_policy(model) is True
+    assert not [s for s in statements if s.startswith("UPDATE")]
+
+    rows = (await session.execute(select(CasbinRule))).scalars().all()
+    assert sorted(str(row) for row in rows) == [
+        "g, alice, data2_admin",
+        "p, bob, data2, write",
+        "p, data2_admin, data2, read",
+        "p, data2_admin, data2, write",
+        "p, eve, data3, read",
+    ]
+    assert await adapter.incremental_save_policy(model) == PolicyChanges(
+        inserted=0,
+        deleted=0,
+    )
+
+    model.clear_policy()
+    assert await adapter.incremental_save_policy(model) == PolicyChanges(
+        inserted=0,
+        deleted=5,
+    )
+
+
+async def test_ensure_indexes(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    CustomRule: SQLModel,  # noqa: N803
+) -> None:
+    adapter = Adapter(engine)
+    assert await adapter.ensure_indexes() == []
+
+    custom_adapter = Adapter(engine, CustomRule)
+    await custom_adapter.create_table()
+    assert await custom_adapter.ensure_indexes() == []
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DROP INDEX ix_casbin_rule2_ptype_v1")
+        await conn.exec_driver_sql("DROP INDEX uq_casbin_rule2_rule")
+        await conn.exec_driver_sql(
+            "CREATE INDEX custom_ptype_v1_v2 ON casbin_rule2 (ptype, v1, v2)",
+        )
+
+    assert await custom_adapter.ensure_indexes() == ["uq_casbin_rule2_rule"]
+    async with engine.connect() as conn:
+        plan = await conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM casbin_rule2 WHERE ptype = 'p' AND v0 = 'alice'",
+        )
+        assert "uq_casbin_rule2_rule" in str(plan.all())
+
+
+async def test_unique_rule_key(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    CustomRule: SQLModel,  # noqa: N803
+) -> None:
+    adapter = Adapter(engine)
+    await adapter.add_policies(
+        "g",
+        "g",
+        [["bob", "admin"], ["bob", "admin", "tenant1"]],
+    )
+    # Rules with fewer than six values are rejected as well, their unused values being NULL.
+    with pytest.raises(IntegrityError):
+        await adapter.add_policy("g", "g", ["bob", "admin"])
+
+    custom_adapter = Adapter(engine, CustomRule)
+    await custom_adapter.create_table()
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DROP INDEX uq_casbin_rule2_rule")
+    await custom_adapter.add_policies("p", "p", [["bob", "data1", "read"]] * 3)
+    with pytest.raises(AdapterError, match=r"bob, data1, read \(3 times\)"):
+        await custom_adapter.ensure_indexes()
+    await custom_adapter.remove_policy("p", "p", ["bob", "data1", "read"])
+    assert await custom_adapter.ensure_indexes() == ["uq_casbin_rule2_rule"]
+
+
+@pytest.mark.parametrize(
+    ("url", "key"),
+    [
+        ("postgresql://", "(ptype, v0, v1, coalesce(v2, ''), coalesce(v3, ''),"),
+        ("mysql://", "(ptype, v0, (md5(concat_ws('\x1f', v1, coalesce(v2, ''),"),
+        ("mssql://", "(ptype, v0, v1, v2, v3, v4, v5)"),
+    ],
+)
+def test_unique_rule_key_per_dialect(url: str, key: str) -> None:
+    ddl: list[str] = []
+
+    def executor(sql: ExecutableDDLElement, *_args: object) -> None:
+        ddl.append(str(sql.compile(dialect=engine.dialect)))
+
+    engine = create_mock_engine(url, executor)
+    SQLModel.metadata.create_all(engine, tables=[CasbinRule.__table__])
+    (unique_key,) = (sql for sql in ddl if "uq_casbin_rule_rule" in sql)
+    assert key in unique_key
+    assert "(100)" not in unique_key
+
+
+async def test_changelog_incremental_load(
+    engine: AsyncEngine,
+    enforcer: AsyncEnforcer,
+    rbac_model_conf: str,
+) -> None:
+    writer = Adapter(engine, changelog_class=CasbinRuleChange)
+    assert await writer.get_revision() == 0
+
+    reader = AsyncEnforcer(rbac_model_conf, writer)
+    await reader.load_policy()
+    revision = await writer.get_revision()
+    assert await writer.load_incremental_policy(reader.get_model(), revision) == 0
+
+    enforcer.set_adapter(writer)
+    await enforcer.add_policy("eve", "data3", "read")
+    await enforcer.add_policies([["eve", "data4", "read"], ["eve", "data5", "read"]])
+    await enforcer.remove_policy("alice", "data1", "read")
+    await enforcer.update_policy(["bob", "data2", "write"], ["bob", "data3", "write"])
+    await enforcer.remove_filtered_policy(1, "data2")
+    await enforcer.add_grouping_policy("eve", "data2_admin")
+
+    revision = await writer.load_incremental_policy(reader.get_model(), revision)
+    assert revision == await writer.get_revision() > 0
+    reader.build_role_links()
+    assert sorted(reader.get_policy()) == sorted(enforcer.get_policy())
+    assert sorted(reader.get_grouping_policy()) == sorted(
+        enforcer.get_grouping_policy(),
+    )
+    assert reader.enforce("eve", "data4", "read")
+    assert not reader.enforce("alice", "data1", "read")
+    assert reader.enforce("bob", "data3", "write")
+
+    assert await writer.compact_changelog(revision + 1) == revision - 1
+    stale = AsyncEnforcer(rbac_model_conf, writer)
+    assert await writer.load_incremental_policy(stale.get_model(), 1) == revision
+    assert sorted(stale.get_policy()) == sorted(enforcer.get_policy())
+
+    await enforcer.save_policy()
+    stale.get_model().clear_policy()
+    assert (
+        await writer.load_incremental_policy(stale.get_model(), revision)
+        == revision + 1
+    )
+    assert sorted(stale.get_policy()) == sorted(enforcer.get_policy())
+
+
+async def test_changelog_revisions_never_repeat(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    writer = Adapter(engine, changelog_class=CasbinRuleChange)
+    await writer.add_policies(
+        "p",
+        "p",
+        [["eve", "data1", "read"], ["eve", "data2", "read"]],
+    )
+    assert await writer.get_revision() == 2  # noqa: PLR2004
+    # Revisions keep growing once the changelog is emptied.
+    await session.execute(delete(CasbinRuleChange))
+    await session.commit()
+    await writer.add_policy("p", "p", ["eve", "data3", "read"])
+    assert await writer.get_revision() == 3  # noqa: PLR2004
+    # A missing head starts after the recorded entries.
+    await session.execute(delete(CasbinChangelogHead))
+    await session.commit()
+    await writer.add_policy("p", "p", ["eve", "data4", "read"])
+    assert await writer.get_revision() == 4  # noqa: PLR2004
+
+
+async def test_changelog_revisions_follow_commit_order(tmp_path: Path) -> None:
+    async with Adapter(
+        f"sqlite+aiosqlite:///{tmp_path / 'policy.db'}",
+        warning=False,
+        changelog_class=CasbinRuleChange,
+    ) as writer:
+        await writer.create_table()
+
+        async def log(session: AsyncSession, user: str) -> None:
+            await writer._log_changes(  # noqa: SLF001
+                session,
+                "add",
+                [("p", user, "data1", "read")],
+            )
+
+        async with writer.session_local() as first, writer.session_local() as second:
+            await log(first, "alice")
+            # The second transaction waits for the first to release the changelog head.
+            waiting = asyncio.create_task(log(second, "bob"))
+            await asyncio.sleep(0.1)
+            assert not waiting.done()
+            await first.commit()
+            await waiting
+            # Readers only see the revisions up to the first uncommitted one.
+            assert await writer.get_revision() == 1
+            await second.commit()
+        assert await writer.get_revision() == 2  # noqa: PLR2004
+        async with writer.session_local() as session:
+            entries = await session.scalars(
+                select(CasbinRuleChange.v0).order_by(CasbinRuleChange.revision),
+            )
+            assert entries.all() == ["alice", "bob"]
+
+
+def test_changelog_class_validation(
+    engine: AsyncEngine,
+    CustomRule: SQLModel,  # noqa: N803
+) -> None:
+    with pytest.raises(AdapterError):
+        Adapter(engine, changelog_class=CustomRule)
+    with pytest.raises(AdapterError):
+        Adapter(engine)._changelog_table  # noqa: B018,SLF001
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy.dialects import postgresql
+from sqlmodel import delete, select
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError
+from async_casbin_sqlmodel_adapter.closure import RoleClosure
+from async_casbin_sqlmodel_adapter.models import (
+    CasbinEncodedRule,
+    CasbinRoleClosure,
+    CasbinRoleClosureLock,
+    CasbinString,
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+@pytest.mark.parametrize("encoded", [False, True])
+async def test_closure_follows_role_writes(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    encoded: bool,  # noqa: FBT001
+) -> None:
+    adapter = Adapter(
+        engine,
+        closure_class=CasbinRoleClosure,
+        **(
+            {"db_class": CasbinEncodedRule, "string_class": CasbinString}
+            if encoded
+            else {}
+        ),
+    )
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.add_grouping_policies(
+        [["alice", "admin"], ["admin", "superadmin"], ["bob", "admin"]],
+    )
+    await enforcer.add_policy("alice", "data1", "read")
+    assert await adapter.get_implicit_roles("alice") == ["admin", "superadmin"]
+    assert await adapter.get_implicit_roles("alice", max_depth=1) == ["admin"]
+    assert await adapter.get_implicit_roles("superadmin") == []
+
+    await adapter.update_policy(
+        "g",
+        "g",
+        ["admin", "superadmin"],
+        ["admin", "auditor"],
+    )
+    assert await adapter.get_implicit_roles("bob") == ["admin", "auditor"]
+    await enforcer.remove_grouping_policy("bob", "admin")
+    assert await adapter.get_implicit_roles("bob") == []
+
+    async with adapter.batch():
+        await adapter.add_policies("g", "g", [["carol", "alice"]])
+        await adapter.remove_filtered_policy("g", "g", 1, "auditor")
+    assert await adapter.load_role_closure() == {
+        None: {"alice": ["admin"], "carol": ["alice", "admin"]},
+    }
+
+    # Saving the enforcer's model, which missed the writes made through the adapter, rebuilds the closure.
+    enforcer.get_model().add_policy("g", "g", ["dave", "alice"])
+    await enforcer.save_policy()
+    assert await adapter.load_role_closure() == {
+        None: {
+            "admin": ["superadmin"],
+            "alice": ["admin", "superadmin"],
+            "dave": ["alice", "admin", "superadmin"],
+        },
+    }
+
+
+async def test_closure_per_domain(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_with_domains_model_conf: str,
+) -> None:
+    adapter = Adapter(engine, closure_class=CasbinRoleClosure)
+    enforcer = AsyncEnforcer(rbac_with_domains_model_conf, adapter)
+    await enforcer.add_grouping_policies(
+        [
+            ["alice", "admin", "domain1"],
+            ["admin", "owner", "domain1"],
+            ["alice", "reader", "domain2"],
+        ],
+    )
+    assert await adapter.get_implicit_roles("alice", "domain1") == ["admin", "owner"]
+    assert await adapter.get_implicit_roles("alice", "domain2") == ["reader"]
+    assert await adapter.get_implicit_roles("alice") == []
+
+    # Removing without a domain recomputes every domain of the ptype.
+    await enforcer.remove_filtered_grouping_policy(1, "admin")
+    assert await adapter.load_role_closure() == {
+        "domain1": {"admin": ["owner"]},
+        "domain2": {"alice": ["reader"]},
+    }
+
+
+async def closure_rows(session: AsyncSession) -> set[tuple[str, str, str, int]]:
+    result = await session.execute(
+        select(
+            CasbinRoleClosure.domain,
+            CasbinRoleClosure.user,
+            CasbinRoleClosure.role,
+            CasbinRoleClosure.depth,
+        ),
+    )
+    return set(result.tuples().all())
+
+
+async def test_added_links_extend_the_closure(
+    engine: AsyncEngine,
+    session: AsyncSession,
+    statements: list[str],
+) -> None:
+    adapter = Adapter(engine, closure_class=CasbinRoleClosure)
+    await adapter.add_policies("g", "g", [["a", "b"], ["b", "c"]])
+    await adapter.add_policy("g", "g", ["c", "d"])
+    # A shortcut shortens the stored distances, a link back to the start makes a cycle.
+    await adapter.add_policy("g", "g", ["a", "d"])
+    statements.clear()
+    await adapter.add_policy("g", "g", ["d", "a"])
+    assert not [stmt for stmt in statements if "FROM casbin_rule " in stmt]
+    assert await adapter.get_implicit_roles("a", max_depth=1) == ["b", "d"]
+
+    added = await closure_rows(session)
+    await adapter.rebuild_role_closure()
+    assert await closure_rows(session) == added
+    assert ("", "d", "d", 2) in added
+
+
+def test_closure_scopes_are_locked() -> None:
+    closure = RoleClosure(
+        CasbinRoleClosure.__table__,
+        CasbinRoleClosureLock.__table__,
+        "postgresql",
+        100,
+    )
+
+    def compile_locks(domains: set[str] | None) -> list[str]:
+        return [
+            str(stmt.compile(dialect=postgresql.dialect()))
+            for stmt in closure._lock_selects("g", domains)  # noqa: SLF001
+        ]
+
+    # Refreshing domains shares the ptype row and takes their own rows.
+    ptype_lock, domain_lock = compile_locks({"domain2", "domain1"})
+    assert ptype_lock.endswith("FOR SHARE")
+    assert domain_lock.endswith("ORDER BY casbin_role_closure_lock.domain FOR UPDATE")
+    # Refreshing the whole ptype, or its rules without a domain, takes the ptype row alone.
+    assert compile_locks(None) == compile_locks({""})
+    assert [stmt.endswith(" FOR UPDATE") for stmt in compile_locks(None)] == [True]
+
+
+async def test_rebuild_role_closure(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    adapter = Adapter(engine, closure_class=CasbinRoleClosure)
+    await adapter.add_policies("g", "g", [["alice", "admin"], ["admin", "root"]])
+    await session.execute(delete(CasbinRoleClosure))
+    await session.commit()
+    assert await adapter.get_implicit_roles("alice") == []
+
+    await adapter.rebuild_role_closure()
+    assert await adapter.get_implicit_roles("alice") == ["admin", "root"]
+
+    with pytest.raises(AdapterError):
+        await Adapter(engine).get_implicit_roles("alice")
+    with pytest.raises(AdapterError):
+        Adapter(engine, closure_class=CasbinString)
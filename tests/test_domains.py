@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+
+from async_casbin_sqlmodel_adapter import (
+    Adapter,
+    AdapterError,
+    DomainCacheStats,
+    DomainEnforcers,
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+@pytest.fixture(name="adapter")
+async def adapter_fixture(engine: AsyncEngine, session: AsyncSession) -> Adapter:
+    adapter = Adapter(engine)
+    await adapter.add_policies(
+        "p",
+        "p",
+        [
+            (f"admin{i}", f"tenant{i}", f"data{i}", action)
+            for i in range(3)
+            for action in ("read", "write")
+        ],
+    )
+    await adapter.add_policies(
+        "g",
+        "g",
+        [(f"user{i}", f"admin{i}", f"tenant{i}") for i in range(3)],
+    )
+    await session.close()
+    return adapter
+
+
+async def test_domain_enforcers_load_on_first_use(
+    adapter: Adapter,
+    rbac_with_domains_model_conf: str,
+    statements: list[str],
+) -> None:
+    domains = DomainEnforcers(adapter, rbac_with_domains_model_conf)
+    enforcer = await domains.get("tenant1")
+    assert enforcer.enforce("user1", "tenant1", "data1", "write")
+    assert not enforcer.enforce("user0", "tenant0", "data0", "read")
+    assert enforcer.get_policy() == [
+        ["admin1", "tenant1", "data1", "read"],
+        ["admin1", "tenant1", "data1", "write"],
+    ]
+    assert enforcer.get_grouping_policy() == [["user1", "admin1", "tenant1"]]
+
+    loaded_statements = len(statements)
+    assert await domains.get("tenant1") is enforcer
+    assert len(statements) == loaded_statements
+    assert domains.stats == DomainCacheStats(
+        hits=1,
+        misses=1,
+        shared_loads=0,
+        evictions=0,
+        domains=1,
+        rules=3,
+    )
+
+    from_model = DomainEnforcers(adapter, enforcer.get_model())
+    other = await from_model.get("tenant2")
+    assert other.get_model() is not enforcer.get_model()
+    assert other.enforce("user2", "tenant2", "data2", "read")
+
+
+async def test_domain_enforcers_share_concurrent_loads(
+    adapter: Adapter,
+    rbac_with_domains_model_conf: str,
+) -> None:
+    domains = DomainEnforcers(adapter, rbac_with_domains_model_conf)
+    first, second, third = await asyncio.gather(
+        domains.get("tenant0"),
+        domains.get("tenant0"),
+        domains.get("tenant0"),
+    )
+    assert first is second is third
+    assert domains.stats.misses == 1
+    expected_shared_loads = 2
+    assert domains.stats.shared_loads == expected_shared_loads
+
+
+async def test_domain_enforcers_evict_least_recently_used(
+    adapter: Adapter,
+    rbac_with_domains_model_conf: str,
+) -> None:
+    domains = DomainEnforcers(adapter, rbac_with_domains_model_conf, max_domains=2)
+    tenant0 = await domains.get("tenant0")
+    await domains.get("tenant1")
+    assert await domains.get("tenant0") is tenant0
+    await domains.get("tenant2")
+    assert domains.stats.evictions == 1
+    assert await domains.get("tenant0") is tenant0
+    assert domains.stats.domains == domains.stats.evictions + 1
+
+    by_rules = DomainEnforcers(adapter, rbac_with_domains_model_conf, max_rules=5)
+    await by_rules.get("tenant0")
+    await by_rules.get("tenant1")
+    assert by_rules.stats.domains == 1
+    assert by_rules.stats.rules == by_rules.stats.domains * 3
+
+    domains.invalidate("tenant0")
+    assert await domains.get("tenant0") is not tenant0
+    domains.invalidate()
+    assert domains.stats.domains == 0
+    assert domains.stats.rules == 0
+
+
+async def test_domain_enforcers_validation(
+    adapter: Adapter,
+    rbac_with_domains_model_conf: str,
+) -> None:
+    with pytest.raises(AdapterError):
+        DomainEnforcers(adapter, rbac_with_domains_model_conf, max_domains=0)
+    with pytest.raises(AdapterError):
+        DomainEnforcers(adapter, rbac_with_domains_model_conf, max_rules=0)
+    with pytest.raises(AdapterError):
+        DomainEnforcers(adapter, rbac_with_domains_model_conf, domain_fields={"p": 6})
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import func, select
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError, Filter, Match
+from async_casbin_sqlmodel_adapter.models import CasbinEncodedRule, CasbinString
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+def encoded_adapter(engine: AsyncEngine, **kwargs: object) -> Adapter:
+    return Adapter(
+        engine,
+        db_class=CasbinEncodedRule,
+        string_class=CasbinString,
+        **kwargs,
+    )
+
+
+async def stored_strings(session: AsyncSession) -> list[str]:
+    session.expire_all()
+    return list(
+        (await session.execute(select(CasbinString.value).order_by(CasbinString.id)))
+        .scalars()
+        .all(),
+    )
+
+
+async def test_encoded_policy_round_trip(
+    engine: AsyncEngine,
+    session: AsyncSession,
+    rbac_model_conf: str,
+) -> None:
+    adapter = encoded_adapter(engine)
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    assert await enforcer.add_policies(
+        [
+            ["alice", "data1", "read"],
+            ["bob", "data2", "write"],
+            ["data2_admin", "data2", "read"],
+            ["data2_admin", "data2", "write"],
+        ],
+    )
+    assert await enforcer.add_grouping_policy("alice", "data2_admin")
+    # Every distinct value is stored once.
+    assert sorted(await stored_strings(session)) == [
+        "alice",
+        "bob",
+        "data1",
+        "data2",
+        "data2_admin",
+        "g",
+        "p",
+        "read",
+        "write",
+    ]
+
+    reloaded = AsyncEnforcer(
+        rbac_model_conf,
+        encoded_adapter(engine, load_partitions=2, partition_by="ptype"),
+    )
+    await reloaded.load_policy()
+    assert reloaded.get_policy() == enforcer.get_policy()
+    assert reloaded.get_grouping_policy() == [["alice", "data2_admin"]]
+    assert reloaded.enforce("alice", "data2", "write")
+
+    assert await enforcer.remove_policy("bob", "data2", "write")
+    assert not await enforcer.remove_policy("carol", "data2", "write")
+    assert await enforcer.update_policy(
+        ["alice", "data1", "read"],
+        ["alice", "data3", "read"],
+    )
+    assert await enforcer.remove_filtered_policy(0, "data2_admin", "", "write")
+    await reloaded.load_policy()
+    assert reloaded.get_policy() == [
+        ["alice", "data3", "read"],
+        ["data2_admin", "data2", "read"],
+    ]
+
+    old_rules = await adapter.update_filtered_policies(
+        "p",
+        "p",
+        [["carol", "data4", "read"]],
+        0,
+        "data2_admin",
+    )
+    assert old_rules == [["data2_admin", "data2", "read"]]
+    await reloaded.load_policy()
+    assert reloaded.get_policy() == [
+        ["alice", "data3", "read"],
+        ["carol", "data4", "read"],
+    ]
+
+
+async def test_encoded_filtered_load(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+) -> None:
+    adapter = encoded_adapter(engine)
+    await adapter.add_policies(
+        "p",
+        "p",
+        [
+            ["tenant1/alice", "data1", "read"],
+            ["tenant1/bob", "data2", "write"],
+            ["tenant2/carol", "data1", "read"],
+        ],
+    )
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+
+    await enforcer.load_filtered_policy(
+        Filter(ptype=["p"], v0=Match.prefix("tenant1/"), v2=Match.not_in("write")),
+    )
+    assert enforcer.get_policy() == [["tenant1/alice", "data1", "read"]]
+
+    enforcer.clear_policy()
+    await enforcer.load_filtered_policy(
+        Filter(v1=["data1"], v3=Match.is_null(), v0=Match.not_in("unknown")),
+    )
+    assert enforcer.get_policy() == [
+        ["tenant1/alice", "data1", "read"],
+        ["tenant2/carol", "data1", "read"],
+    ]
+
+    page = await adapter.query_policies(Filter(v1=["data1"]), limit=1)
+    assert page.rows == [("p", "tenant1/alice", "data1", "read", None, None, None)]
+    page = await adapter.query_policies(
+        Filter(v1=["data1"]),
+        after=page.next_after,
+        limit=1,
+    )
+    assert page == ([("p", "tenant2/carol", "data1", "read", None, None, None)], None)
+    tenant1_rules = 2
+    assert (
+        await adapter.count_policies(Filter(v0=Match.prefix("tenant1/")))
+        == tenant1_rules
+    )
+    assert await adapter.policy_exists(
+        Filter.exact("p", ["tenant1/bob", "data2", "write"]),
+    )
+    assert not await adapter.policy_exists(
+        Filter.exact("p", ["tenant1/bob", "data9", "write"]),
+    )
+
+
+async def test_encoded_save_policy(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+) -> None:
+    enforcer = AsyncEnforcer(rbac_model_conf, encoded_adapter(engine))
+    await enforcer.add_policy("alice", "data1", "read")
+    enforcer.get_model().add_policy("p", "p", ["bob", "data2", "write"])
+    await enforcer.save_policy()
+
+    incremental = AsyncEnforcer(
+        rbac_model_conf,
+        encoded_adapter(engine, incremental_save=True),
+    )
+    await incremental.load_policy()
+    assert incremental.get_policy() == [
+        ["alice", "data1", "read"],
+        ["bob", "data2", "write"],
+    ]
+    incremental.get_model().remove_policy("p", "p", ["alice", "data1", "read"])
+    incremental.get_model().add_policy("p", "p", ["carol", "data3", "read"])
+    await incremental.save_policy()
+
+    await enforcer.load_policy()
+    assert enforcer.get_policy() == [
+        ["bob", "data2", "write"],
+        ["carol", "data3", "read"],
+    ]
+
+
+async def test_encoded_rollback_keeps_cache_consistent(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    adapter = encoded_adapter(engine)
+
+    async def failing_batch() -> None:
+        async with adapter.batch():
+            await adapter.add_policies("p", "p", [["alice", "data1", "read"]])
+            await adapter.update_filtered_policies(
+                "p",
+                "p",
+                [["bob", "data2", "read"]],
+                0,
+                "alice",
+            )
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        await failing_batch()
+    assert await stored_strings(session) == []
+
+    # The strings inserted by the rolled back transaction are not assumed to exist.
+    assert await adapter.add_policies("p", "p", [["bob", "data2", "read"]]) == 1
+    rows = (
+        await session.execute(select(func.count()).select_from(CasbinEncodedRule))
+    ).scalar_one()
+    assert rows == 1
+    assert sorted(await stored_strings(session)) == ["bob", "data2", "p", "read"]
+
+    with pytest.raises(AdapterError):
+        Adapter(engine, string_class=CasbinEncodedRule)
+
+
+async def test_copy_policy_from(tmp_path: Path, rbac_model_conf: str) -> None:
+    # The source is streamed while the rules are written, on two connections of a file database.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'policy.db'}")
+    source = Adapter(engine, warning=False, load_chunk_size=2)
+    encoded = encoded_adapter(engine)
+    await source.create_table()
+    await encoded.create_table()
+    enforcer = AsyncEnforcer(rbac_model_conf, source)
+    await enforcer.add_policies(
+        [
+            ["alice", "data1", "read"],
+            ["bob", "data2", "write"],
+            ["bob", "data1", "read"],
+        ],
+    )
+    await enforcer.add_grouping_policy("alice", "admin")
+
+    expected_rows = 4
+    assert await encoded.copy_policy_from(source) == expected_rows
+    migrated = AsyncEnforcer(rbac_model_conf, encoded)
+    await migrated.load_policy()
+    assert migrated.get_policy() == enforcer.get_policy()
+    assert migrated.get_grouping_policy() == enforcer.get_grouping_policy()
+    await engine.dispose()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy import event
+
+from async_casbin_sqlmodel_adapter import Adapter, OperationMetrics, opentelemetry_hook
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+async def test_hook_receives_operation_metrics(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+) -> None:
+    metrics: list[OperationMetrics] = []
+    adapter = Adapter(engine, hooks=[metrics.append])
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+    metrics.clear()
+
+    rules = [["alice", "data1", "read"], ["bob", "data2", "write"]]
+    assert await enforcer.add_policies(rules)
+    await enforcer.load_policy()
+    assert await enforcer.remove_policy("bob", "data2", "write")
+
+    assert [m.operation for m in metrics] == [
+        "add_policies",
+        "load_policy",
+        "remove_policy",
+    ]
+    added, loaded, removed = metrics
+    assert added.rows == len(rules)
+    assert added.statements == 1
+    assert loaded.rows == len(rules)
+    assert loaded.statements == 1
+    # remove_policy runs remove_policies, only the outer operation is reported.
+    assert removed.rows == 1
+    for m in metrics:
+        assert m.error is None
+        assert m.seconds > 0
+        assert m.pool_wait_seconds >= 0
+
+
+async def test_hook_receives_errors(engine: AsyncEngine) -> None:
+    metrics: list[OperationMetrics] = []
+    adapter = Adapter(engine, hooks=[metrics.append])
+    with pytest.raises(Exception, match="no such table"):
+        await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+    (failed,) = metrics
+    assert failed.operation == "add_policy"
+    assert failed.error is not None
+
+
+async def test_failing_hook_is_ignored(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+) -> None:
+    def failing_hook(_metrics: OperationMetrics) -> None:
+        raise RuntimeError
+
+    metrics: list[OperationMetrics] = []
+    adapter = Adapter(engine, hooks=[failing_hook, metrics.append])
+    assert await adapter.add_policies("p", "p", [["alice", "data1", "read"]]) == 1
+    assert [m.operation for m in metrics] == ["add_policies"]
+
+
+async def test_remove_hook_stops_measuring(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+) -> None:
+    metrics: list[OperationMetrics] = []
+    adapter = Adapter(engine)
+    adapter.add_hook(metrics.append)
+    assert event.contains(
+        engine.sync_engine,
+        "before_cursor_execute",
+        adapter._count_statement,  # noqa: SLF001
+    )
+    adapter.remove_hook(metrics.append)
+    assert not event.contains(
+        engine.sync_engine,
+        "before_cursor_execute",
+        adapter._count_statement,  # noqa: SLF001
+    )
+    await adapter.add_policies("p", "p", [["alice", "data1", "read"]])
+    assert metrics == []
+
+
+class FakeSpan:
+    def __init__(self: FakeSpan, name: str, **kwargs: Any) -> None:  # noqa: ANN401
+        self.name = name
+        self.start_time = kwargs["start_time"]
+        self.attributes = kwargs["attributes"]
+        self.exceptions: list[BaseException] = []
+        self.end_time: int | None = None
+
+    def record_exception(self: FakeSpan, exc: BaseException) -> None:
+        self.exceptions.append(exc)
+
+    def end(self: FakeSpan, end_time: int) -> None:
+        self.end_time = end_time
+
+
+class FakeTracer:
+    def __init__(self: FakeTracer) -> None:
+        self.spans: list[FakeSpan] = []
+
+    def start_span(
+        self: FakeTracer,
+        name: str,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> FakeSpan:
+        span = FakeSpan(name, **kwargs)
+        self.spans.append(span)
+        return span
+
+
+async def test_opentelemetry_hook(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+) -> None:
+    tracer = FakeTracer()
+    adapter = Adapter(engine, hooks=[opentelemetry_hook(tracer)])
+    await adapter.add_policies("p", "p", [["alice", "data1", "read"]])
+
+    (span,) = tracer.spans
+    assert span.name == "casbin.add_policies"
+    assert span.attributes["casbin.rows"] == 1
+    assert span.attributes["db.statement_count"] == 1
+    assert span.start_time <= span.end_time
+    assert span.exceptions == []
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy import event, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError, Filter
+from async_casbin_sqlmodel_adapter.adapter import (
+    _statement_timeout_sql,  # noqa: PLC2701
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+def create_pooled_engine(url: str, **kwargs: object) -> AsyncEngine:
+    """Create an engine with a queue pool, which SQLite file databases do not get by default."""
+    return create_async_engine(url, poolclass=AsyncAdaptedQueuePool, **kwargs)
+
+
+def record_disposals(engine: AsyncEngine, disposed: list[AsyncEngine]) -> None:
+    event.listen(
+        engine.sync_engine,
+        "engine_disposed",
+        lambda _: disposed.append(engine),
+    )
+
+
+async def test_adapter_owns_the_engines_it_creates(
+    rbac_model_conf: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    for module in ("adapter", "replicas"):
+        monkeypatch.setattr(
+            f"async_casbin_sqlmodel_adapter.{module}.create_async_engine",
+            create_pooled_engine,
+        )
+    pool_size = 2
+    disposed: list[AsyncEngine] = []
+    async with Adapter(
+        f"sqlite+aiosqlite:///{tmp_path / 'policy.db'}",
+        warning=False,
+        read_engines=f"sqlite+aiosqlite:///{tmp_path / 'policy.db'}",
+        pool_size=pool_size,
+        max_overflow=1,
+        pool_pre_ping=True,
+        pool_recycle=60,
+    ) as adapter:
+        # Sessions are bound to the engine created from the string.
+        assert adapter.session_local.kw["bind"] is adapter.engine
+        for engine in (adapter.engine, *adapter.read_engines):
+            assert engine.pool.size() == pool_size
+            record_disposals(engine, disposed)
+        await adapter.create_table()
+        enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+        assert await enforcer.add_policy("alice", "data1", "read")
+        await enforcer.load_policy()
+        assert enforcer.enforce("alice", "data1", "read")
+        assert not disposed
+    assert disposed == [adapter.engine, *adapter.read_engines]
+
+
+async def test_adapter_leaves_shared_engines_open(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    tmp_path: Path,
+) -> None:
+    disposed: list[AsyncEngine] = []
+    record_disposals(engine, disposed)
+    async with Adapter(
+        engine,
+        read_engines=f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}",
+    ) as adapter:
+        await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+        replica = adapter.read_engines[0]
+        record_disposals(replica, disposed)
+    assert disposed == [replica]
+
+    # Another adapter sharing the engine keeps using its connection.
+    assert await Adapter(engine).policy_exists(
+        Filter.exact("p", ["alice", "data1", "read"]),
+    )
+
+
+async def test_invalid_lifecycle_options(engine: AsyncEngine) -> None:
+    with pytest.raises(AdapterError):
+        Adapter(engine, pool_size=0)
+    with pytest.raises(AdapterError):
+        Adapter(engine, pool_recycle=0)
+    with pytest.raises(AdapterError):
+        Adapter(engine, statement_timeout=0)
+    # SQLite cannot cancel a statement after a timeout.
+    with pytest.raises(AdapterError):
+        Adapter(engine, statement_timeout=5)
+
+
+async def test_statement_timeout_is_set_once_per_connection(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # SQLite has no statement timeout, a busy timeout stands in for it as another per-connection setting.
+    monkeypatch.setattr(
+        "async_casbin_sqlmodel_adapter.adapter._statement_timeout_sql",
+        lambda _, seconds: f"PRAGMA busy_timeout = {round(seconds * 1000)}",
+    )
+    engine = create_pooled_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'policy.db'}",
+        pool_size=1,
+        max_overflow=0,
+    )
+    statements: list[str] = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    timeout_ms, busy_timeout_ms = 2000, 10
+    busy_timeout = text("PRAGMA busy_timeout")
+    async with Adapter(
+        engine,
+        warning=False,
+        statement_timeout=timeout_ms / 1000,
+    ) as adapter:
+        await adapter.create_table()
+        async with adapter.session_local() as session:
+            assert (await session.execute(busy_timeout)).scalar_one() == timeout_ms
+            await session.execute(text(f"PRAGMA busy_timeout = {busy_timeout_ms}"))
+        # The pooled connection is not given the timeout again.
+        assert await adapter.add_policy("p", "alice", ["data1", "read"])
+        async with adapter.session_local() as session:
+            assert (await session.execute(busy_timeout)).scalar_one() == busy_timeout_ms
+    # Sessions do not run a statement of their own for it.
+    assert f"PRAGMA busy_timeout = {timeout_ms}" not in statements
+    assert not engine.sync_engine.pool.dispatch.checkout
+    await engine.dispose()
+
+
+def test_statement_timeout_sql() -> None:
+    assert (
+        _statement_timeout_sql(postgresql.dialect(), 1.5)
+        == "SET SESSION statement_timeout = 1500"
+    )
+    assert (
+        _statement_timeout_sql(mysql.dialect(), 2)
+        == "SET SESSION max_execution_time = 2000"
+    )
+    assert (
+        _statement_timeout_sql(mysql.dialect(is_mariadb=True), 2)
+        == "SET SESSION max_statement_time = 2"
+    )
+    with pytest.raises(AdapterError):
+        _statement_timeout_sql(sqlite.dialect(), 2)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import pytest
+
+from async_casbin_sqlmodel_adapter import AdapterError, PolicyRefresher
+
+if TYPE_CHECKING:
+    from casbin import AsyncEnforcer, Model
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+    from async_casbin_sqlmodel_adapter import Adapter
+
+
+async def test_refresh_swaps_the_policy(
+    enforcer: AsyncEnforcer,
+    engine: AsyncEngine,  # noqa: ARG001
+) -> None:
+    adapter: Adapter = enforcer.get_adapter()
+    previous = enforcer.get_model()
+    await adapter.add_policies("p", "p", [["carol", "data3", "read"]])
+    await adapter.add_policies("g", "g", [["carol", "data2_admin"]])
+    assert not enforcer.enforce("carol", "data3", "read")
+
+    refresher = PolicyRefresher(enforcer)
+    await refresher.refresh()
+    assert refresher.refreshes == 1
+    assert enforcer.enforce("carol", "data3", "read")
+    assert enforcer.enforce("carol", "data2", "write")
+    assert enforcer.enforce("alice", "data2", "read")
+    # The previous model and its role managers are left as they were.
+    assert enforcer.get_model() is not previous
+    assert ["carol", "data3", "read"] not in previous.get_policy("p", "p")
+
+    # The enforcer's own writes keep going to the new model and role managers.
+    assert await enforcer.add_grouping_policy("bob", "data2_admin")
+    assert enforcer.enforce("bob", "data2", "read")
+
+
+async def test_refresh_never_exposes_a_partial_policy(
+    enforcer: AsyncEnforcer,
+) -> None:
+    adapter: Adapter = enforcer.get_adapter()
+    await adapter.add_policies(
+        "p",
+        "p",
+        [[f"user{i}", "data", "read"] for i in range(50)],
+    )
+    adapter._load_chunk_size = 1  # noqa: SLF001
+    refresher = PolicyRefresher(enforcer)
+    seen: list[bool] = []
+
+    async def enforce_while_loading() -> None:
+        while refresher.refreshes == 0:
+            seen.append(enforcer.enforce("alice", "data2", "write"))
+            await asyncio.sleep(0)
+
+    await asyncio.gather(enforce_while_loading(), refresher.refresh())
+    assert seen
+    assert all(seen)
+    assert enforcer.enforce("user49", "data", "read")
+
+
+async def test_refresh_failure_keeps_the_previous_policy(
+    enforcer: AsyncEnforcer,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    adapter: Adapter = enforcer.get_adapter()
+    await adapter.add_policies("p", "p", [["carol", "data3", "read"]])
+
+    async def failing_load(model: Model) -> None:  # noqa: ARG001
+        raise ConnectionError
+
+    monkeypatch.setattr(adapter, "load_policy", failing_load)
+    refresher = PolicyRefresher(enforcer)
+    with pytest.raises(ConnectionError):
+        await refresher.refresh()
+    assert isinstance(refresher.last_error, ConnectionError)
+    assert enforcer.enforce("alice", "data2", "write")
+    assert not enforcer.enforce("carol", "data3", "read")
+
+
+async def test_refresh_retries_when_the_adapter_wrote(
+    enforcer: AsyncEnforcer,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    adapter: Adapter = enforcer.get_adapter()
+    load_policy = adapter.load_policy
+    loads: list[int] = []
+
+    async def load_then_write(model: Model) -> None:
+        await load_policy(model)
+        loads.append(1)
+        if len(loads) == 1:
+            await enforcer.add_policy("carol", "data3", "read")
+
+    monkeypatch.setattr(adapter, "load_policy", load_then_write)
+    await PolicyRefresher(enforcer).refresh()
+    expected_loads = 2
+    assert len(loads) == expected_loads
+    assert enforcer.enforce("carol", "data3", "read")
+
+
+async def test_periodic_refresh(
+    enforcer: AsyncEnforcer,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    adapter: Adapter = enforcer.get_adapter()
+    with pytest.raises(AdapterError):
+        PolicyRefresher(enforcer).start()
+    with pytest.raises(AdapterError):
+        PolicyRefresher(enforcer, interval=0)
+
+    load_policy = adapter.load_policy
+    failures = [1]
+
+    async def flaky_load(model: Model) -> None:
+        if failures:
+            failures.pop()
+            raise ConnectionError
+        await load_policy(model)
+
+    async def refreshed() -> None:
+        while not enforcer.enforce("carol", "data3", "read"):
+            await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(adapter, "load_policy", flaky_load)
+    async with PolicyRefresher(enforcer, interval=0.01) as refresher:
+        await adapter.add_policies("p", "p", [["carol", "data3", "read"]])
+        await asyncio.wait_for(refreshed(), 2)
+    assert refresher.refreshes >= 1
+    assert any(
+        record.levelno == logging.ERROR and "keeping the previous one" in record.message
+        for record in caplog.records
+    )
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError, OperationMetrics
+from async_casbin_sqlmodel_adapter.models import CasbinRuleChange
+from async_casbin_sqlmodel_adapter.snapshot import read_snapshot
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+async def replica_engine(path: Path, subject: str) -> AsyncEngine:
+    """Create a replica whose only rule names it, to tell which engine a load was served by."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    await Adapter(engine, warning=False).add_policy("p", "p", [subject, "data", "read"])
+    return engine
+
+
+async def loaded_subjects(enforcer: AsyncEnforcer) -> list[str]:
+    await enforcer.load_policy()
+    return [rule[0] for rule in enforcer.get_policy()]
+
+
+async def test_loads_round_robin_over_replicas(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    replicas = [
+        await replica_engine(tmp_path / "replica1.db", "replica1"),
+        await replica_engine(tmp_path / "replica2.db", "replica2"),
+    ]
+    adapter = Adapter(engine, read_engines=replicas)
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    assert adapter.read_engines == replicas
+
+    assert await loaded_subjects(enforcer) == ["replica1"]
+    assert await loaded_subjects(enforcer) == ["replica2"]
+    assert await loaded_subjects(enforcer) == ["replica1"]
+
+    # Writes go to the primary only.
+    assert await enforcer.add_policy("primary", "data", "read")
+    assert await loaded_subjects(enforcer) == ["replica2"]
+    for replica in replicas:
+        await replica.dispose()
+
+
+async def test_load_reads_a_single_replica(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    replicas = []
+    for i in (1, 2):
+        replica = await replica_engine(tmp_path / f"replica{i}.db", f"replica{i}")
+        writer = Adapter(replica, changelog_class=CasbinRuleChange)
+        for round_ in range(i):
+            await writer.add_policies(
+                "p",
+                "p",
+                [[f"replica{i}", f"data{round_}.{j}", "read"] for j in range(10)],
+            )
+        replicas.append(replica)
+    snapshot_path = tmp_path / "policy.snap"
+    adapter = Adapter(
+        engine,
+        read_engines=replicas,
+        changelog_class=CasbinRuleChange,
+        snapshot_path=snapshot_path,
+        load_partitions=3,
+    )
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+
+    # The revision, the partition bounds and the partitions all come from the replica the load started on.
+    for subject, revision in (("replica1", 10), ("replica2", 20)):
+        assert set(await loaded_subjects(enforcer)) == {subject}
+        assert read_snapshot(snapshot_path, f"casbin_rule:{revision}") is not None
+    for replica in replicas:
+        await replica.dispose()
+
+
+async def test_incremental_load_reads_a_single_replica(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    current = await replica_engine(tmp_path / "current.db", "current")
+    writer = Adapter(current, changelog_class=CasbinRuleChange)
+    added = 3
+    for i in range(added):
+        await writer.add_policy("p", "p", ["current", f"data{i}", "read"])
+    # Only the latest revision is left, a model loaded before any write needs a full reload.
+    revision = await writer.get_revision()
+    await writer.compact_changelog(revision)
+    stale = await replica_engine(tmp_path / "stale.db", "stale")
+    adapter = Adapter(
+        engine,
+        read_engines=[current, stale],
+        changelog_class=CasbinRuleChange,
+    )
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+
+    assert await adapter.load_incremental_policy(enforcer.get_model(), 0) == revision
+    # The stale replica only has the rule naming it.
+    assert [rule[0] for rule in enforcer.get_policy()] == ["current"] * (added + 1)
+    for replica in (current, stale):
+        await replica.dispose()
+
+
+async def test_hooks_count_replica_statements(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    replica = await replica_engine(tmp_path / "replica.db", "replica")
+    metrics: list[OperationMetrics] = []
+    adapter = Adapter(engine, read_engines=replica, hooks=[metrics.append])
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+
+    assert await loaded_subjects(enforcer) == ["replica"]
+    (loaded,) = metrics
+    assert loaded.statements == 1
+    adapter.remove_hook(metrics.append)
+    for bound in (engine, replica):
+        assert not event.contains(
+            bound.sync_engine,
+            "before_cursor_execute",
+            adapter._count_statement,  # noqa: SLF001
+        )
+    await replica.dispose()
+
+
+async def test_failed_replica_is_skipped(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    replica = await replica_engine(tmp_path / "replica.db", "replica")
+    missing = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/x.db")
+    adapter = Adapter(engine, read_engines=[missing, replica])
+    await adapter.add_policy("p", "p", ["primary", "data", "read"])
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+
+    assert await loaded_subjects(enforcer) == ["replica"]
+    assert await loaded_subjects(enforcer) == ["replica"]
+
+    # Every replica is down: loads fall back to the primary.
+    await replica.dispose()
+    adapter = Adapter(engine, read_engines=missing)
+    assert await loaded_subjects(AsyncEnforcer(rbac_model_conf, adapter)) == [
+        "primary",
+    ]
+
+
+async def test_read_your_writes(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    replica = await replica_engine(tmp_path / "replica.db", "replica")
+    adapter = Adapter(engine, read_engines=str(replica.url), read_your_writes=60)
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    assert await loaded_subjects(enforcer) == ["replica"]
+
+    assert await enforcer.add_policy("primary", "data", "read")
+    assert await loaded_subjects(enforcer) == ["primary"]
+
+    adapter._last_write -= 60  # noqa: SLF001
+    assert await loaded_subjects(enforcer) == ["replica"]
+
+    await replica.dispose()
+    await adapter.read_engines[0].dispose()
+    with pytest.raises(AdapterError):
+        Adapter(engine, read_engines=replica, read_your_writes=0)
+    with pytest.raises(AdapterError):
+        Adapter(engine, read_engines=replica, replica_retry_interval=-1)
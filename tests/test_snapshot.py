@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from casbin import AsyncEnforcer
+
+from async_casbin_sqlmodel_adapter import Adapter
+from async_casbin_sqlmodel_adapter.models import CasbinRuleChange
+from async_casbin_sqlmodel_adapter.snapshot import SnapshotWriter, read_snapshot
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    path = tmp_path / "policy.snapshot"
+    rows = [
+        ("p", "alice", "data1", "read", None, None, None),
+        ("p", "bob", "données", "read", None, None, None),
+        ("g", "alice", "admin", "", None, None, None),
+    ]
+    writer = SnapshotWriter()
+    writer.add_rows(rows)
+    writer.write(path, "casbin_rule:3")
+
+    assert list(read_snapshot(path, "casbin_rule:3")) == rows
+    assert read_snapshot(path, "casbin_rule:4") is None
+    assert read_snapshot(tmp_path / "missing", "casbin_rule:3") is None
+
+    SnapshotWriter().write(path, "empty")
+    assert list(read_snapshot(path, "empty")) == []
+
+    path.write_bytes(b"garbage")
+    assert read_snapshot(path, "casbin_rule:3") is None
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "policy.snapshot"
+    writer = SnapshotWriter()
+    writer.add_rows(
+        ("p", "alice", f"data{i}", "read", None, None, None) for i in range(10)
+    )
+    writer.write(path, "casbin_rule:10")
+    data = path.read_bytes()
+    row_size = 4 * 7
+
+    path.write_bytes(data[: -4 * row_size])
+    assert read_snapshot(path, "casbin_rule:10") is None
+    path.write_bytes(data + bytes(row_size))
+    assert read_snapshot(path, "casbin_rule:10") is None
+    path.write_bytes(data[:-4] + (1000).to_bytes(4, "little"))
+    assert read_snapshot(path, "casbin_rule:10") is None
+    path.write_bytes(data[:40])
+    assert read_snapshot(path, "casbin_rule:10") is None
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_concurrent_snapshot_writes(tmp_path: Path) -> None:
+    path = tmp_path / "policy.snapshot"
+    rows = [("p", "alice", "data1", "read", None, None, None)]
+    writers = 8
+    with ThreadPoolExecutor(writers) as pool:
+        for _ in range(writers):
+            writer = SnapshotWriter()
+            writer.add_rows(rows)
+            pool.submit(writer.write, path, "casbin_rule:1")
+    assert list(read_snapshot(path, "casbin_rule:1")) == rows
+    assert list(tmp_path.iterdir()) == [path]
+
+
+async def test_load_policy_from_snapshot(
+    engine: AsyncEngine,
+    enforcer: AsyncEnforcer,
+    rbac_model_conf: str,
+    tmp_path: Path,
+    statements: list[str],
+) -> None:
+    path = tmp_path / "policy.snapshot"
+    adapter = Adapter(engine, changelog_class=CasbinRuleChange, snapshot_path=path)
+    cold = AsyncEnforcer(rbac_model_conf, adapter)
+    await cold.load_policy()
+    assert path.exists()
+    assert sorted(cold.get_policy()) == sorted(enforcer.get_policy())
+
+    statements.clear()
+    warm = AsyncEnforcer(rbac_model_conf, adapter)
+    await warm.load_policy()
+    assert len(statements) == 1
+    assert sorted(warm.get_policy()) == sorted(enforcer.get_policy())
+    assert warm.enforce("alice", "data2", "read")
+
+    await cold.add_policy("eve", "data3", "read")
+    stale = AsyncEnforcer(rbac_model_conf, adapter)
+    await stale.load_policy()
+    assert stale.enforce("eve", "data3", "read")
+
+
+async def test_load_policy_from_truncated_snapshot(
+    engine: AsyncEngine,
+    enforcer: AsyncEnforcer,
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "policy.snapshot"
+    adapter = Adapter(engine, changelog_class=CasbinRuleChange, snapshot_path=path)
+    await AsyncEnforcer(rbac_model_conf, adapter).load_policy()
+    path.write_bytes(path.read_bytes()[: -4 * 7])
+
+    truncated = AsyncEnforcer(rbac_model_conf, adapter)
+    await truncated.load_policy()
+    assert sorted(truncated.get_policy()) == sorted(enforcer.get_policy())
+    assert sorted(truncated.get_grouping_policy()) == sorted(
+        enforcer.get_grouping_policy(),
+    )
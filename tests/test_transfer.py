@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError
+from async_casbin_sqlmodel_adapter.models import CasbinEncodedRule, CasbinString
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+POLICY = [
+    ["alice", "data1", "read"],
+    ["bob", "data2", "write"],
+    ["data2_admin", "data2", "read"],
+]
+
+
+async def test_export_import_round_trip(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    enforcer = AsyncEnforcer(rbac_model_conf, Adapter(engine, load_chunk_size=2))
+    await enforcer.add_policies(POLICY)
+    await enforcer.add_grouping_policy("alice", "data2_admin")
+
+    for name in ("policy.csv", "policy.jsonl"):
+        path = tmp_path / name
+        exported: list[int] = []
+        expected_rows = 4
+        assert (
+            await enforcer.get_adapter().export_policies(
+                path,
+                progress=exported.append,
+            )
+            == expected_rows
+        )
+        assert exported == [2, 4]
+
+        target = Adapter(engine, db_class=CasbinEncodedRule, string_class=CasbinString)
+        await target.create_table()
+        assert await target.import_policies(path) == expected_rows
+        imported = AsyncEnforcer(rbac_model_conf, target)
+        await imported.load_policy()
+        assert imported.get_policy() == POLICY
+        assert imported.get_grouping_policy() == [["alice", "data2_admin"]]
+        imported.clear_policy()
+        await imported.save_policy()
+
+    assert (tmp_path / "policy.csv").read_text().splitlines()[
+        0
+    ] == "p, alice, data1, read"
+    assert (tmp_path / "policy.jsonl").read_text().splitlines()[-1] == (
+        '{"ptype": "g", "rule": ["alice", "data2_admin"]}'
+    )
+
+
+async def test_import_dedupe_and_progress(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    adapter = Adapter(engine)
+    await adapter.add_policies("p", "p", [POLICY[0]])
+    path = tmp_path / "policy.txt"
+    path.write_text(
+        "# exported policy\n"
+        "p, alice, data1, read\n"
+        "\n"
+        "p, bob, data2, write\n"
+        "p, bob, data2, write\n"
+        "p, carol, data3, read\n"
+        "p, alice, data1\n"
+        "g, alice, data2_admin\n",
+    )
+
+    read: list[int] = []
+    expected_rows = 4
+    assert (
+        await adapter.import_policies(
+            path,
+            format="csv",
+            dedupe=True,
+            progress=read.append,
+            chunk_size=3,
+        )
+        == expected_rows
+    )
+    # Progress counts the rules read, comments and blank lines are not rules.
+    assert read == [1, 4, 6]
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+    assert enforcer.get_policy() == [
+        ["alice", "data1", "read"],
+        ["bob", "data2", "write"],
+        ["carol", "data3", "read"],
+        ["alice", "data1"],
+    ]
+    assert await adapter.import_policies(path, format="csv", dedupe=True) == 0
+
+
+async def test_import_rejects_invalid_files(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+    tmp_path: Path,
+) -> None:
+    adapter = Adapter(engine)
+    with pytest.raises(AdapterError):
+        await adapter.import_policies(tmp_path / "policy.txt")
+
+    path = tmp_path / "policy.jsonl"
+    path.write_text(
+        '{"ptype": "p", "rule": ["alice", "data1", "read"]}\n{"ptype": "p"}\n',
+    )
+    with pytest.raises(AdapterError, match="Line 2"):
+        await adapter.import_policies(path, chunk_size=1)
+    # The rules of the chunks read before the invalid line are rolled back.
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+    assert enforcer.get_policy() == []
+
+
+async def test_eval_rules_round_trip(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    tmp_path: Path,
+) -> None:
+    rule = ["r.sub.Age > 18 && r.sub.Name in ('a', 'b')", "/data1", "read"]
+    line = "p, r.sub.Age > 18 && r.sub.Name in ('a', 'b'), /data1, read"
+    path = tmp_path / "policy.csv"
+    path.write_text(f"{line}\n")
+    adapter = Adapter(engine)
+    assert await adapter.import_policies(path) == 1
+    assert (await adapter.query_policies()).rows == [("p", *rule, None, None, None)]
+
+    assert await adapter.export_policies(path) == 1
+    assert path.read_text() == f"{line}\n"
+
+    # A comma outside brackets would split the value when read back.
+    await adapter.add_policy("p", "p", ["alice, bob", "data1", "read"])
+    with pytest.raises(AdapterError, match="JSONL"):
+        await adapter.export_policies(path)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError, Watcher
+from async_casbin_sqlmodel_adapter.models import CasbinPolicyRevision
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+
+@pytest.fixture(name="file_engine")
+async def file_engine_fixture(tmp_path: Path) -> AsyncEngine:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'watcher.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def test_watcher_coalesces_foreign_updates(file_engine: AsyncEngine) -> None:
+    adapter = Adapter(file_engine)
+    calls: dict[str, int] = {"writer": 0, "reader": 0}
+
+    async def reader_callback() -> None:
+        calls["reader"] += 1
+
+    async with (
+        Watcher(adapter, interval=0.01, debounce=0.01) as writer,
+        Watcher(adapter, interval=0.01, debounce=0.2) as reader,
+    ):
+        writer.set_update_callback(
+            lambda: calls.__setitem__("writer", calls["writer"] + 1),
+        )
+        reader.set_update_callback(reader_callback)
+
+        for _ in range(5):
+            writer.update()
+        await wait_for(lambda: calls["reader"] == 1)
+        await asyncio.sleep(0.3)
+        assert calls == {"writer": 0, "reader": 1}
+
+        await reader.bump()
+        await wait_for(lambda: calls["writer"] == 1)
+        assert calls["reader"] == 1
+
+    async with file_engine.connect() as conn:
+        row = (
+            await conn.execute(
+                select(CasbinPolicyRevision.revision, CasbinPolicyRevision.origin),
+            )
+        ).one()
+    assert row == (6, reader.node_id)
+
+
+async def test_watcher_reloads_enforcer(
+    file_engine: AsyncEngine,
+    rbac_model_conf: str,
+) -> None:
+    writer_enforcer = AsyncEnforcer(rbac_model_conf, Adapter(file_engine))
+    reader_enforcer = AsyncEnforcer(rbac_model_conf, Adapter(file_engine))
+    await writer_enforcer.load_policy()
+    await reader_enforcer.load_policy()
+
+    async with (
+        Watcher(writer_enforcer.get_adapter(), interval=0.01, debounce=0.01) as writer,
+        Watcher(reader_enforcer.get_adapter(), interval=0.01, debounce=0.01) as reader,
+    ):
+        writer_enforcer.set_watcher(writer)
+        reader.set_update_callback(reader_enforcer.load_policy)
+        await writer_enforcer.add_policy("eve", "data1", "read")
+        await wait_for(lambda: reader_enforcer.enforce("eve", "data1", "read"))
+
+
+def test_watcher_validation(engine: AsyncEngine) -> None:
+    adapter = Adapter(engine)
+    with pytest.raises(AdapterError):
+        Watcher(adapter, channel="casbin")
+    with pytest.raises(AdapterError):
+        Watcher(adapter, revision_class=SQLModel)
+    # The options can still be passed positionally, as in the first release.
+    with pytest.raises(AdapterError):
+        Watcher(adapter, None, 0.01, 0.01, "casbin")
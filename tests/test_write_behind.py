@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+from casbin import AsyncEnforcer
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import select
+
+from async_casbin_sqlmodel_adapter import Adapter, AdapterError
+from async_casbin_sqlmodel_adapter.models import CasbinRule
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+    from async_casbin_sqlmodel_adapter.adapter import RuleRow
+
+
+async def stored_rules(session: AsyncSession) -> list[tuple[str, str, str]]:
+    session.expire_all()
+    result = await session.execute(
+        select(CasbinRule.v0, CasbinRule.v1, CasbinRule.v2).order_by(CasbinRule.id),
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def test_write_behind_cancels_and_flushes(
+    engine: AsyncEngine,
+    session: AsyncSession,
+    rbac_model_conf: str,
+    statements: list[str],
+) -> None:
+    adapter = Adapter(engine, write_behind_interval=60)
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    assert await enforcer.add_policy("alice", "data1", "read")
+    assert await enforcer.add_policy("bob", "data2", "write")
+    assert await enforcer.remove_policy("bob", "data2", "write")
+    assert await enforcer.update_policy(
+        ["alice", "data1", "read"],
+        ["alice", "data1", "write"],
+    )
+    assert statements == []
+    assert await stored_rules(session) == []
+
+    # Only the net change is written: alice's rule in its final state.
+    assert await adapter.flush() == 1
+    assert await stored_rules(session) == [("alice", "data1", "write")]
+
+    assert await enforcer.remove_policy("alice", "data1", "write")
+    await adapter.aclose()
+    assert await stored_rules(session) == []
+    assert await adapter.flush() == 0
+
+
+async def test_write_behind_flushes_on_interval_and_size(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    adapter = Adapter(engine, write_behind_interval=0.01)
+    await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+    await asyncio.sleep(0.1)
+    assert await stored_rules(session) == [("alice", "data1", "read")]
+    await adapter.aclose()
+
+    adapter = Adapter(
+        engine,
+        write_behind_interval=60,
+        write_batch_size=10,
+        write_behind_max_pending=4,
+    )
+    rules = [[f"user{i}", "data1", "read"] for i in range(6)]
+    await adapter.add_policies("p", "p", rules)
+    # The writer flushed the first four rules itself when the queue was full.
+    expected_stored = 5
+    assert len(await stored_rules(session)) == expected_stored
+    await adapter.aclose()
+    assert len(await stored_rules(session)) == len(rules) + 1
+
+
+async def test_write_behind_load_sees_pending_writes(
+    engine: AsyncEngine,
+    session: AsyncSession,  # noqa: ARG001
+    rbac_model_conf: str,
+) -> None:
+    adapter = Adapter(engine, write_behind_interval=60)
+    await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+    assert enforcer.get_policy() == [["alice", "data1", "read"]]
+    await adapter.aclose()
+
+    with pytest.raises(AdapterError):
+        Adapter(engine, write_behind_interval=0)
+    with pytest.raises(AdapterError):
+        Adapter(engine, write_behind_interval=1, write_behind_max_pending=0)
+
+
+async def test_write_behind_drops_rejected_rules(
+    engine: AsyncEngine,
+    session: AsyncSession,
+) -> None:
+    session.add(CasbinRule(ptype="p", v0="alice", v1="data1", v2="read"))
+    await session.commit()
+    rejected: list[tuple[str, RuleRow, Exception]] = []
+    adapter = Adapter(
+        engine,
+        write_behind_interval=60,
+        write_behind_on_error=lambda *args: rejected.append(args),
+    )
+    rules = [[f"user{i}", "data1", "read"] for i in range(5)]
+    await adapter.add_policies("p", "p", [*rules[:2], ["alice", "data1", "read"]])
+    await adapter.add_policies("p", "p", rules[2:])
+
+    # The rule the unique key rejects is dropped, the others are written.
+    assert await adapter.flush() == len(rules)
+    ((op, row, exc),) = rejected
+    assert (op, row) == ("add", ("p", "alice", "data1", "read", None, None, None))
+    assert isinstance(exc, IntegrityError)
+    assert len(await stored_rules(session)) == len(rules) + 1
+    assert await adapter.flush() == 0
+    await adapter.aclose()
+
+
+async def test_write_behind_keeps_rules_on_database_errors(
+    engine: AsyncEngine,
+    session: AsyncSession,
+    rbac_model_conf: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    adapter = Adapter(engine, write_behind_interval=60)
+    await adapter.add_policy("p", "p", ["alice", "data1", "read"])
+
+    async def lose_connection(*_args: object) -> None:
+        msg = "INSERT"
+        raise OperationalError(msg, {}, ConnectionError())
+
+    monkeypatch.setattr(adapter, "_write_pending", lose_connection)
+    with pytest.raises(OperationalError):
+        await adapter.flush()
+    # Loads go on without the queued writes, which stay queued.
+    enforcer = AsyncEnforcer(rbac_model_conf, adapter)
+    await enforcer.load_policy()
+    assert enforcer.get_policy() == []
+    assert await stored_rules(session) == []
+
+    monkeypatch.undo()
+    assert await adapter.flush() == 1
+    assert await stored_rules(session) == [("alice", "data1", "read")]
+    await adapter.aclose()